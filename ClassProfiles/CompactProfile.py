@@ -0,0 +1,142 @@
+import weakref
+import numpy as np
+from .FractionProfile import FractionProfile
+from .FractionSchema import FractionSchema
+from .ProfileSet import ProfileSet, SampleDataView
+from .ProfileErrors import ProfileError, UnequalFractionsError, EmptyProfileError
+from typing import Self, List, Dict, Set, Tuple
+
+
+class SharedInformation(dict):
+
+    """
+    Read-only information dictionary shared by all profiles with identical information. It is a real dict, so
+    lookups, iteration, json and the information indices work unchanged; only modifications are refused.
+    """
+
+    __slots__ = ("__weakref__",)
+
+    # (key, value) items -> shared dictionary, alive as long as a profile references it
+    _interned: 'weakref.WeakValueDictionary[Tuple, SharedInformation]' = weakref.WeakValueDictionary()
+
+    @classmethod
+    def intern(cls, information: Dict[str, str]) -> Self:
+
+        '''
+        returns the shared dictionary with the same items, creating it on first use. Information with unhashable
+        values is not interned but still made read-only.
+        '''
+
+        if information is None or isinstance(information, SharedInformation):
+            return information
+
+        items = tuple(information.items())
+
+        try:
+            shared = cls._interned.get(items)
+        except TypeError:
+            return cls(items)
+
+        if shared is None:
+            shared = cls._interned[items] = cls(items)
+
+        return shared
+
+    def _read_only(self, *args, **kwargs):
+        raise ProfileError("The information of a CompactProfile is shared with other profiles and cannot be modified, assign a new dictionary instead.")
+
+    __setitem__ = __delitem__ = __ior__ = update = pop = popitem = clear = setdefault = _read_only
+
+    def __reduce__(self):
+        return SharedInformation.intern, (dict(self),)
+
+
+class CompactProfile(FractionProfile):
+
+    __slots__ = ("schema", "values")
+
+    def __init__(self, iD: str, sample_information: Dict[str, str], sampleData: Dict[str, float]):
+
+        """
+        Memory-lean FractionProfile for collections of hundreds of thousands of profiles. Instead of a __dict__,
+        a sampleData dictionary and an information dictionary per profile it holds
+
+            - the intensities in a small float array (values),
+            - a reference to the interned FractionSchema of its fractions, shared by all profiles measured on
+              the same fractions,
+            - a reference to an interned, read-only information dictionary (SharedInformation), shared by all
+              profiles with identical information.
+
+        sampleData is a read-through view (reading and writing go to values) and information behaves like a
+        dictionary, so code written for FractionProfile keeps working:
+
+            profiles = CompactProfile.objectify_w_profiles(profile_set)
+            profiles[0].sampleData["F1"]
+            profiles[0].information["treatment"]
+
+        Args:
+            iD (str): iD of the profile.
+            sample_information (Dict[str, str]): information of the profile, interned on construction.
+            sampleData (Dict[str, float]): fraction -> intensity, stored as array along an interned schema.
+        """
+
+        self.iD: str = iD
+        self.information: Dict[str, str] = SharedInformation.intern(sample_information)
+        self.sampleData = sampleData
+
+    @property
+    def sampleData(self) -> SampleDataView:
+        return SampleDataView(self.schema.index, self.values)
+
+    @sampleData.setter
+    def sampleData(self, sampleData: Dict[str, float]) -> None:
+
+        self.schema: FractionSchema = FractionSchema.intern(sampleData.keys())
+        self.values: np.ndarray = np.fromiter(sampleData.values(), dtype=np.float64, count=len(self.schema))
+
+    @property
+    def fractions(self) -> Tuple[str]:
+        return self.schema.fractions
+
+    def __repr__(self) -> str:
+        return f"CompactProfile(iD={self.iD!r}, no_fractions={len(self.schema)})"
+
+    def __reduce__(self):
+        # rebuilt through the constructor, so that schema and information are interned again after unpickling
+        return self.__class__, (self.iD, dict(self.information) if self.information is not None else None, dict(self.sampleData))
+
+    @classmethod
+    def objectify_w_profile(cls, profile: 'Profile', deep_copy: bool = False) -> Self:
+
+        if not profile:
+            raise EmptyProfileError
+
+        return cls(profile.iD, profile.information, profile.sampleData)
+
+    @classmethod
+    def objectify_w_profiles(cls, profiles: List['Profile'], deep_copy: bool = False, fractions: List[str] = None) -> List[Self]:
+
+        '''
+        converts a list of profiles or a ProfileSet. The intensities are copied once into a single block and every
+        profile holds a row of it; all profiles share one schema.
+        '''
+
+        return cls.objectify_w_profile_set(ProfileSet.objectify_w_profiles(profiles, fractions))
+
+    @classmethod
+    def objectify_w_profile_set(cls, profile_set: ProfileSet) -> List[Self]:
+
+        schema = FractionSchema.intern(profile_set.fractions)
+        data = profile_set.data.copy()
+
+        compact_profiles: List[Self] = []
+        for iD, information, values in zip(profile_set.iDs, profile_set.information, data):
+            # bypasses __init__, the rows are already aligned on the schema
+            profile = cls.__new__(cls)
+            profile.iD = iD
+            profile.information = SharedInformation.intern(information)
+            profile.schema = schema
+            profile.values = values
+            compact_profiles.append(profile)
+
+        return compact_profiles
@@ -0,0 +1,144 @@
+import numpy as np
+from .ProfileErrors import ProfileError
+from typing import Self, List, Dict, Set, Tuple
+
+
+class CondensedDistanceMatrix(object):
+
+    def __init__(self, condensed: np.ndarray, size: int, diagonal: float = 0.0):
+
+        """
+        Symmetric distance matrix that only stores the upper triangle (without the diagonal) as a flat array
+        of length size * (size - 1) / 2, in row-major order, i.e. (0, 1), (0, 2), ..., (0, n-1), (1, 2), ...
+
+        Args:
+            condensed (np.ndarray): the upper triangle of the matrix.
+            size (int): number of profiles, the square matrix has the dimensions (size, size).
+            diagonal (float): distance of a profile to itself (0 for euclidean, manhattan & spearman, 1 for pearson).
+        """
+
+        self.condensed: np.ndarray = condensed
+        self.size: int = size
+        self.diagonal: float = diagonal
+
+        if len(self.condensed) != size * (size - 1) // 2:
+            raise ProfileError(f"A condensed matrix of {size} profiles needs {size * (size - 1) // 2} entries, got {len(self.condensed)}.")
+
+    @staticmethod
+    def condensed_index(i, j, size: int):
+
+        '''
+        maps square matrix indices (i, j), i != j, onto positions in the condensed array. Accepts integers or arrays.
+        '''
+
+        i, j = np.minimum(i, j), np.maximum(i, j)
+
+        if np.any(i == j):
+            raise ProfileError("The diagonal is not part of the condensed matrix.")
+
+        return size * i - i * (i + 1) // 2 + (j - i - 1)
+
+    @staticmethod
+    def square_index(k, size: int):
+
+        '''
+        maps positions in the condensed array back onto the square matrix indices (i, j) with i < j.
+        '''
+
+        k = np.asarray(k)
+        # solve k = size * i - i * (i + 1) / 2 for the row i; the rows before i hold k entries in total
+        i = (2 * size - 1 - np.sqrt((2 * size - 1) ** 2 - 8 * k)) // 2
+        i = i.astype(np.int64)
+        # guard against rounding at the row boundaries
+        i = np.where(CondensedDistanceMatrix.row_start(i + 1, size) <= k, i + 1, i)
+        i = np.where(CondensedDistanceMatrix.row_start(i, size) > k, i - 1, i)
+        j = k - CondensedDistanceMatrix.row_start(i, size) + i + 1
+
+        return i, j
+
+    @staticmethod
+    def row_start(i, size: int):
+        return size * i - i * (i + 1) // 2
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.size, self.size)
+
+    @property
+    def nbytes(self) -> int:
+        return self.condensed.nbytes
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __repr__(self) -> str:
+        return f"CondensedDistanceMatrix(size={self.size})"
+
+    def row(self, i: int) -> np.ndarray:
+
+        '''
+        returns row i of the square matrix (identical to column i).
+        '''
+
+        if i < 0:
+            i += self.size
+
+        out = np.empty(self.size, dtype=self.condensed.dtype)
+        out[i] = self.diagonal
+
+        # column i of the rows above the diagonal ...
+        above = np.arange(i)
+        out[:i] = self.condensed[CondensedDistanceMatrix.row_start(above, self.size) + (i - above - 1)]
+        # ... and the stored part of row i right of the diagonal
+        start = CondensedDistanceMatrix.row_start(i, self.size)
+        out[i + 1:] = self.condensed[start:start + self.size - i - 1]
+
+        return out
+
+    def __getitem__(self, key):
+
+        if isinstance(key, (int, np.integer)):
+            return self.row(key)
+
+        if isinstance(key, tuple) and len(key) == 2:
+            i, j = key
+
+            if isinstance(i, (int, np.integer)) and isinstance(j, (int, np.integer)):
+                return self.diagonal if i == j else self.condensed[CondensedDistanceMatrix.condensed_index(i % self.size, j % self.size, self.size)]
+
+            # the matrix is symmetric, so a column is the same as the row
+            if isinstance(i, (int, np.integer)):
+                return self.row(i)[j]
+            if isinstance(j, (int, np.integer)):
+                return self.row(j)[i]
+
+        return self.square()[key]
+
+    def square(self) -> np.ndarray:
+
+        '''
+        expands the condensed matrix into the full (size, size) matrix. Only done on request, e.g. for plotting.
+        '''
+
+        square = np.empty((self.size, self.size), dtype=self.condensed.dtype)
+        upper_i, upper_j = np.triu_indices(self.size, k=1)
+        square[upper_i, upper_j] = self.condensed
+        square[upper_j, upper_i] = self.condensed
+        np.fill_diagonal(square, self.diagonal)
+
+        return square
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        square = self.square()
+        return square if dtype is None else square.astype(dtype)
+
+    def __sub__(self, other):
+
+        # e.g. the movement matrix between treatment and control stays condensed
+        if isinstance(other, CondensedDistanceMatrix) and other.size == self.size:
+            return CondensedDistanceMatrix(self.condensed - other.condensed, self.size, self.diagonal - other.diagonal)
+
+        return self.square() - np.asarray(other)
+
+    def __rsub__(self, other):
+        return np.asarray(other) - self.square()
@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+import numpy as np
+from .ProfileSet import ProfileSet
+from .CondensedDistanceMatrix import CondensedDistanceMatrix
+from .ProfileErrors import ProfileError, ProfileNotFoundError
+from typing import Self, List, Dict, Set, Tuple
+
+
+class CubeStore(object):
+
+    FORMAT: str = "ImmunoCube"
+    VERSION: int = 1
+
+    def __init__(self, path: str):
+
+        """
+        On-disk store for profile collections and distance matrices. Every entry is a directory of .npy files
+        (intensities, iDs, dictionary-encoded information columns, matrices) plus a small JSON file, and a
+        manifest.json lists all entries. Arrays are opened memory-mapped, so loading does not read the payload,
+        and several processes opening the same store share the pages through the OS page cache.
+
+            store = CubeStore("experiment.cube")
+            store.save_profiles("raw", profile_set)
+            store.save_profiles("sum", sum_profiles, profile_class="SumProfile")
+            store.save_distance_matrix("dmso", *ProfileManager.get_distance_matrix(dmso, dmso))
+            profile_set = store.load_profiles("raw")
+
+        Args:
+            path (str): directory of the store, created if it does not exist.
+        """
+
+        self.path: str = path
+        os.makedirs(path, exist_ok=True)
+
+        self.manifest: Dict = {"format": CubeStore.FORMAT, "version": CubeStore.VERSION, "entries": {}}
+
+        if os.path.exists(self._manifest_path()):
+            with open(self._manifest_path()) as file:
+                self.manifest = json.load(file)
+
+            if self.manifest.get("format") != CubeStore.FORMAT:
+                raise ProfileError(f"{path} is not an {CubeStore.FORMAT} store.")
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def _entry_path(self, name: str) -> str:
+
+        # entries are directories directly below the store; anything that could resolve elsewhere is refused
+        separators = [separator for separator in (os.sep, os.altsep) if separator]
+        if (not isinstance(name, str) or name in ("", ".", "..") or os.path.isabs(name) or any(separator in name for separator in separators)
+                or name.startswith("manifest.json")):
+            raise ProfileError(f"{name!r} is not a valid entry name of an {CubeStore.FORMAT} store.")
+
+        return os.path.join(self.path, name)
+
+    def _write_manifest(self) -> None:
+
+        # write next to the old manifest and swap, so that readers never see a half written file
+        temporary = self._manifest_path() + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.manifest, file, indent=1)
+        os.replace(temporary, self._manifest_path())
+
+    def _prepare_entry(self, name: str) -> str:
+
+        entry_path = self._entry_path(name)
+
+        if name in self.manifest["entries"]:
+            self.remove(name)
+
+        os.makedirs(entry_path, exist_ok=True)
+
+        return entry_path
+
+    def _entry(self, name: str, kind: str) -> Dict:
+
+        entry = self.manifest["entries"].get(name)
+
+        if entry is None or entry["kind"] != kind:
+            raise ProfileNotFoundError(f"The store has no {kind} entry called {name}.")
+
+        return entry
+
+    def names(self, kind: str = None) -> List[str]:
+        return [name for name, entry in self.manifest["entries"].items() if kind is None or entry["kind"] == kind]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.manifest["entries"]
+
+    def remove(self, name: str) -> None:
+
+        entry_path = self._entry_path(name)
+
+        self.manifest["entries"].pop(name, None)
+        self._write_manifest()
+        shutil.rmtree(entry_path, ignore_errors=True)
+
+    def save_profiles(self, name: str, profiles: List['Profile'], profile_class: str = None) -> None:
+
+        '''
+        saves a profile collection (list or ProfileSet). profile_class records what kind of profiles were stored,
+        e.g. "SumProfile" or "ReferenceProfile", and defaults to the class of the first profile of a list.
+        '''
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles)
+
+        if profile_class is None:
+            profile_class = "FractionProfile" if isinstance(profiles, ProfileSet) else type(profiles[0]).__name__
+
+        entry_path = self._prepare_entry(name)
+
+        np.save(os.path.join(entry_path, "data.npy"), profile_set.data)
+        np.save(os.path.join(entry_path, "iDs.npy"), np.asarray(profile_set.iDs, dtype=np.str_))
+
+        # information table stored column-wise: one code array per key and the distinct values in the JSON
+        keys = list(dict.fromkeys(key for information in profile_set.information for key in information))
+        values: Dict[str, List] = {}
+
+        for column, key in enumerate(keys):
+            codes: Dict = {}
+            column_codes = np.fromiter((-1 if key not in information else codes.setdefault(information[key], len(codes))
+                                        for information in profile_set.information), dtype=np.int32, count=len(profile_set))
+            np.save(os.path.join(entry_path, f"information_{column}.npy"), column_codes)
+            values[key] = list(codes)
+
+        with open(os.path.join(entry_path, "meta.json"), "w") as file:
+            json.dump({"fractions": profile_set.fractions, "information_keys": keys, "information_values": values}, file)
+
+        self.manifest["entries"][name] = {"kind": "profiles", "profile_class": profile_class,
+                                          "no_profiles": len(profile_set), "no_fractions": len(profile_set.fractions)}
+        self._write_manifest()
+
+    def load_profiles(self, name: str, mmap_mode: str = "r") -> ProfileSet:
+
+        '''
+        opens a saved profile collection as ProfileSet whose intensities stay memory-mapped. Use mmap_mode="c" for a
+        copy-on-write view that can be modified in memory, or None to read everything into memory.
+        '''
+
+        self._entry(name, "profiles")
+        entry_path = self._entry_path(name)
+
+        with open(os.path.join(entry_path, "meta.json")) as file:
+            meta = json.load(file)
+
+        data = np.load(os.path.join(entry_path, "data.npy"), mmap_mode=mmap_mode)
+        iDs = np.load(os.path.join(entry_path, "iDs.npy")).tolist()
+
+        columns = [(key, meta["information_values"][key], np.load(os.path.join(entry_path, f"information_{column}.npy")).tolist())
+                   for column, key in enumerate(meta["information_keys"])]
+
+        information = [{} for _ in range(len(iDs))]
+        for key, values, codes in columns:
+            for entry, code in zip(information, codes):
+                if code >= 0:
+                    entry[key] = values[code]
+
+        return ProfileSet(iDs, information, data, meta["fractions"])
+
+    def profile_class(self, name: str) -> str:
+        return self._entry(name, "profiles")["profile_class"]
+
+    def save_distance_matrix(self, name: str, matrix, row_labels: List[str], column_labels: List[str], method: str = None) -> None:
+
+        '''
+        saves a dense distance matrix or a CondensedDistanceMatrix along with its labels.
+        '''
+
+        entry_path = self._prepare_entry(name)
+        condensed = isinstance(matrix, CondensedDistanceMatrix)
+
+        np.save(os.path.join(entry_path, "matrix.npy"), matrix.condensed if condensed else np.asarray(matrix))
+        np.save(os.path.join(entry_path, "row_labels.npy"), np.asarray(row_labels, dtype=np.str_))
+        np.save(os.path.join(entry_path, "column_labels.npy"), np.asarray(column_labels, dtype=np.str_))
+
+        self.manifest["entries"][name] = {"kind": "distance", "method": method, "condensed": condensed,
+                                          "size": matrix.size if condensed else None, "diagonal": matrix.diagonal if condensed else None}
+        self._write_manifest()
+
+    def load_distance_matrix(self, name: str, mmap_mode: str = "r") -> Tuple[np.ndarray, List[str], List[str]]:
+
+        '''
+        opens a saved distance matrix memory-mapped. Returns the matrix along with the row and column labels, like
+        ProfileManager.get_distance_matrix.
+        '''
+
+        entry = self._entry(name, "distance")
+        entry_path = self._entry_path(name)
+
+        matrix = np.load(os.path.join(entry_path, "matrix.npy"), mmap_mode=mmap_mode)
+
+        if entry["condensed"]:
+            matrix = CondensedDistanceMatrix(matrix, entry["size"], entry["diagonal"])
+
+        row_labels = np.load(os.path.join(entry_path, "row_labels.npy")).tolist()
+        column_labels = np.load(os.path.join(entry_path, "column_labels.npy")).tolist()
+
+        return matrix, row_labels, column_labels
@@ -0,0 +1,163 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from .ProfileSet import ProfileSet
+from .CubeStore import CubeStore
+from .ProfileErrors import ProfileError
+from typing import Self, List, Dict, Set, Tuple, Callable
+
+
+class DistanceCache(object):
+
+    def __init__(self, memory_budget: int = 512 * 1024 ** 2, spill_store: CubeStore = None):
+
+        """
+        Content-addressed cache of distance matrices. The key is a blake2b hash of the intensities, iDs and
+        fractions of both profile axes plus the distance method, so equal inputs hit the cache no matter which
+        list or ProfileSet object they come in. Matrices are kept in memory in least recently used order;
+        when memory_budget (bytes) is exceeded the oldest ones are evicted, and with a spill_store (CubeStore or
+        path of one) they are written there and reopened memory-mapped on the next request.
+
+            cache = DistanceCache(memory_budget=2 * 1024 ** 3, spill_store="distances.cube")
+            matrix, rows, columns = ProfileManager.get_distance_matrix(dmso, dmso, "pearson", cache=cache)
+            cache.stats
+
+        Args:
+            memory_budget (int): bytes of matrices kept in memory.
+            spill_store (CubeStore): store for evicted matrices. If None, evicted matrices are dropped.
+        """
+
+        self.memory_budget: int = memory_budget
+        self.spill_store: CubeStore = CubeStore(spill_store) if isinstance(spill_store, str) else spill_store
+
+        self.entries: OrderedDict = OrderedDict()  # key -> (matrix, row labels, column labels)
+        self.nbytes: int = 0
+
+        self.hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.spills: int = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries or (self.spill_store is not None and key in self.spill_store)
+
+    def __repr__(self) -> str:
+        return f"DistanceCache(entries={len(self.entries)}, nbytes={self.nbytes}, memory_budget={self.memory_budget})"
+
+    @staticmethod
+    def fingerprint(profile_set: ProfileSet) -> bytes:
+
+        '''
+        content hash of the intensities, iDs and fractions of a ProfileSet.
+        '''
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(profile_set.data).tobytes())
+        digest.update("\x1f".join(map(str, profile_set.iDs)).encode())
+        digest.update("\x1f".join(profile_set.fractions).encode())
+
+        return digest.digest()
+
+    @staticmethod
+    def key(rows: ProfileSet, columns: ProfileSet, method: str, symmetric: bool = False) -> str:
+
+        row_fingerprint = DistanceCache.fingerprint(rows)
+        column_fingerprint = row_fingerprint if columns is rows else DistanceCache.fingerprint(columns)
+
+        # symmetric requests return a CondensedDistanceMatrix and are kept apart from the square ones
+        details = f"{method.lower()}|{'condensed' if symmetric else 'square'}".encode()
+
+        return hashlib.blake2b(row_fingerprint + column_fingerprint + details, digest_size=20).hexdigest()
+
+    @staticmethod
+    def _size(matrix) -> int:
+        return int(matrix.nbytes)
+
+    def get(self, key: str):
+
+        '''
+        returns (matrix, row labels, column labels) or None. Spilled matrices come back memory-mapped.
+        '''
+
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        if self.spill_store is not None and key in self.spill_store:
+            self.disk_hits += 1
+            return self.spill_store.load_distance_matrix(key)
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, result: Tuple[np.ndarray, List[str], List[str]]) -> None:
+
+        size = DistanceCache._size(result[0])
+
+        if key in self.entries:
+            self.nbytes -= DistanceCache._size(self.entries.pop(key)[0])
+
+        # too big to ever stay in memory: straight to the store, if there is one
+        if size > self.memory_budget:
+            self._spill(key, result)
+            return
+
+        self.entries[key] = result
+        self.nbytes += size
+
+        while self.nbytes > self.memory_budget:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            self.nbytes -= DistanceCache._size(evicted[0])
+            self.evictions += 1
+            self._spill(evicted_key, evicted)
+
+    def _spill(self, key: str, result: Tuple[np.ndarray, List[str], List[str]]) -> None:
+
+        if self.spill_store is None or key in self.spill_store:
+            return
+
+        self.spill_store.save_distance_matrix(key, *result)
+        self.spills += 1
+
+    def get_or_compute(self, rows: ProfileSet, columns: ProfileSet, method: str, symmetric: bool,
+                       compute: Callable[[], Tuple[np.ndarray, List[str], List[str]]]) -> Tuple[np.ndarray, List[str], List[str]]:
+
+        '''
+        returns the cached result for the inputs or calls compute() and caches what it returns.
+        '''
+
+        key = DistanceCache.key(rows, columns, method, symmetric)
+        result = self.get(key)
+
+        if result is None:
+            result = compute()
+            self.put(key, result)
+
+        return result
+
+    def clear(self, spilled: bool = False) -> None:
+
+        '''
+        empties the memory part of the cache (and the spilled matrices if spilled is True). Statistics are kept.
+        '''
+
+        self.entries.clear()
+        self.nbytes = 0
+
+        if spilled and self.spill_store is not None:
+            for name in self.spill_store.names("distance"):
+                self.spill_store.remove(name)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+
+        requests = self.hits + self.disk_hits + self.misses
+
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / requests if requests else 0.0,
+                "evictions": self.evictions, "spills": self.spills, "entries": len(self.entries), "nbytes": self.nbytes}
@@ -0,0 +1,605 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from .ProfileSet import ProfileSet
+from .CondensedDistanceMatrix import CondensedDistanceMatrix
+from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, UnequalFractionsError, EmptyProfileListError
+from typing import Self, List, Dict, Set, Tuple, Callable
+
+
+class DistanceEngine(object):
+
+    '''
+    Batched computation of distance matrices between two profile matrices (no_profiles x no_fractions).
+    The distance measures give the same values as FractionProfile.calculate_distance, but are computed
+    as whole-array operations instead of per pair and per fraction.
+    '''
+
+    METHODS: Tuple[str] = ("euclidean", "manhattan", "spearman", "pearson")
+
+    # number of rows handled per block; bounds the temporary arrays of the manhattan kernel
+    BLOCK_SIZE: int = 512
+
+    @staticmethod
+    def check_method(method: str) -> str:
+
+        method = method.lower()
+
+        if method not in DistanceEngine.METHODS:
+            raise ProfileInvalidDistanceError
+
+        return method
+
+    @staticmethod
+    def prepare(data_rows: np.ndarray, data_columns: np.ndarray, method: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+
+        """
+        Transforms both profile matrices once, so that the distance of every pair can be derived with a
+        matrix multiplication (or a broadcasted difference for manhattan).
+
+        Returns:
+            Tuple: transformed row matrix, transformed column matrix and the squared row norms of both
+            (None for measures that do not need them).
+        """
+
+        data_rows = np.asarray(data_rows, dtype=np.float64)
+        data_columns = np.asarray(data_columns, dtype=np.float64)
+
+        if data_rows.shape[1] != data_columns.shape[1]:
+            raise UnequalFractionsError
+
+        match method:
+            case "euclidean" | "spearman":
+
+                # spearman as implemented in FractionProfile compares the sorted intensities of both profiles
+                if method == "spearman":
+                    data_rows = np.sort(data_rows, axis=1)
+                    data_columns = np.sort(data_columns, axis=1)
+
+                # distances are translation invariant; centering keeps the norm/dot-product identity accurate
+                offset = data_rows.mean(axis=0)
+                data_rows = data_rows - offset
+                data_columns = data_columns - offset
+
+                return data_rows, data_columns, np.einsum("ij,ij->i", data_rows, data_rows), np.einsum("ij,ij->i", data_columns, data_columns)
+
+            case "pearson":
+                return DistanceEngine._standardize(data_rows), DistanceEngine._standardize(data_columns), None, None
+
+            case "manhattan":
+                return data_rows, data_columns, None, None
+
+    @staticmethod
+    def _standardize(data: np.ndarray) -> np.ndarray:
+
+        # centered rows scaled to unit length, so that the pearson coefficient becomes a dot product
+        centered = data - data.mean(axis=1, keepdims=True)
+        norms = np.sqrt(np.einsum("ij,ij->i", centered, centered))
+
+        if np.any(norms == 0):
+            raise ZeroDivisionError("Pearson distance is undefined for profiles with constant intensities.")
+
+        return centered / norms[:, None]
+
+    @staticmethod
+    def kernel(rows: np.ndarray, columns: np.ndarray, norms_rows: np.ndarray, norms_columns: np.ndarray, method: str) -> np.ndarray:
+
+        '''
+        Computes the distances of one block of prepared rows against all prepared columns.
+        '''
+
+        match method:
+            case "euclidean":
+                squared = norms_rows[:, None] + norms_columns[None, :] - 2 * (rows @ columns.T)
+                # rounding can push distances of (almost) identical profiles slightly below zero
+                return np.sqrt(np.maximum(squared, 0, out=squared), out=squared)
+
+            case "spearman":
+                no_fractions = rows.shape[1]
+                squared = norms_rows[:, None] + norms_columns[None, :] - 2 * (rows @ columns.T)
+                np.maximum(squared, 0, out=squared)
+                return squared * (6 / (no_fractions * (no_fractions ** 2 - 1)))
+
+            case "pearson":
+                return rows @ columns.T
+
+            case "manhattan":
+                block = np.empty((rows.shape[0], columns.shape[0]), dtype=np.float64)
+                # keep the broadcasted (rows, columns, fractions) temporary at roughly BLOCK_SIZE**2 elements
+                step = max(1, DistanceEngine.BLOCK_SIZE ** 2 // max(1, columns.shape[0] * columns.shape[1]))
+                for start in range(0, rows.shape[0], step):
+                    block[start:start + step] = np.abs(rows[start:start + step, None, :] - columns[None, :, :]).sum(axis=2)
+                return block
+
+    @staticmethod
+    def fill_block(distance_matrix: np.ndarray, rows: np.ndarray, columns: np.ndarray, norms_rows: np.ndarray, norms_columns: np.ndarray,
+                   method: str, start: int) -> None:
+
+        '''
+        Writes the rows start:start + BLOCK_SIZE of a dense distance matrix. Shared by the serial and the parallel path.
+        '''
+
+        stop = start + DistanceEngine.BLOCK_SIZE
+        distance_matrix[start:stop] = DistanceEngine.kernel(rows[start:stop], columns,
+                                                            None if norms_rows is None else norms_rows[start:stop],
+                                                            norms_columns, method)
+
+    @staticmethod
+    def fill_condensed_block(condensed: np.ndarray, rows: np.ndarray, columns: np.ndarray, norms_rows: np.ndarray, norms_columns: np.ndarray,
+                             method: str, start: int) -> None:
+
+        '''
+        Writes the upper triangle of the rows start:start + BLOCK_SIZE of a condensed distance matrix.
+        '''
+
+        no_profiles = rows.shape[0]
+        stop = min(start + DistanceEngine.BLOCK_SIZE, no_profiles)
+
+        # block of rows against all columns right of the block start, the lower triangle is skipped
+        block = DistanceEngine.kernel(rows[start:stop], columns[start:],
+                                      None if norms_rows is None else norms_rows[start:stop],
+                                      None if norms_columns is None else norms_columns[start:], method)
+
+        for offset, i in enumerate(range(start, stop)):
+            position = CondensedDistanceMatrix.row_start(i, no_profiles)
+            condensed[position:position + no_profiles - i - 1] = block[offset, offset + 1:]
+
+    @staticmethod
+    def fill_parallel(out: np.ndarray, rows: np.ndarray, columns: np.ndarray, norms_rows: np.ndarray, norms_columns: np.ndarray,
+                      method: str, condensed: bool, n_jobs: int) -> None:
+
+        """
+        Distributes the row blocks over a pool of processes. Inputs and output are placed in shared memory,
+        so the workers neither receive pickled profiles nor send back results; every worker writes its rows
+        directly into the output. The block boundaries are the same as in the serial path, which makes the
+        results bit-identical.
+        """
+
+        starts = list(range(0, rows.shape[0], DistanceEngine.BLOCK_SIZE))
+        # a few interleaved partitions per worker (every no_partitions-th block), so that each one gets long rows from the
+        # top and short rows from the bottom of the condensed triangle and the work is balanced
+        no_partitions = min(len(starts), 4 * n_jobs)
+        partitions = [starts[i::no_partitions] for i in range(no_partitions)]
+
+        blocks = []
+
+        try:
+            specs = []
+            for array in (rows, columns, norms_rows, norms_columns, out):
+                if array is None:
+                    specs.append(None)
+                    continue
+                block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                blocks.append(block)
+                shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+                shared[...] = array
+                specs.append((block.name, array.shape, array.dtype.str))
+
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                # list() re-raises exceptions of the workers
+                list(executor.map(_fill_shared_blocks, [specs] * len(partitions), [method] * len(partitions),
+                                  [condensed] * len(partitions), partitions))
+
+            out[...] = np.ndarray(out.shape, dtype=out.dtype, buffer=blocks[-1].buf)
+
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    @staticmethod
+    def fill_self_distances(distance_matrix: np.ndarray, method: str) -> None:
+
+        '''
+        Sets the diagonal of a matrix of profiles against themselves. The norm/dot-product identity leaves rounding
+        noise (~1e-8) where the direct difference is exactly zero; pearson (a correlation) is 1.
+        '''
+
+        np.fill_diagonal(distance_matrix, 1.0 if method == "pearson" else 0.0)
+
+    @staticmethod
+    def number_of_jobs(n_jobs: int) -> int:
+
+        # None/1 -> serial, -1 -> one worker per core
+        if n_jobs is None:
+            return 1
+        if n_jobs < 0:
+            return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+
+        return max(1, n_jobs)
+
+    @staticmethod
+    def calculate_distance_matrix(data_rows: np.ndarray, data_columns: np.ndarray, method: str = "euclidean", n_jobs: int = None) -> np.ndarray:
+
+        """
+        Calculates the distance matrix between the rows of two profile matrices.
+
+        Args:
+            data_rows (np.ndarray): profiles of the row axis, (no_row_profiles, no_fractions).
+            data_columns (np.ndarray): profiles of the column axis, (no_column_profiles, no_fractions).
+            method (str): euclidean (default), manhattan, spearman or pearson.
+            n_jobs (int): number of worker processes. None or 1 computes serially, -1 uses all cores.
+
+        Returns:
+            np.ndarray: distance matrix with the dimensions (no_row_profiles, no_column_profiles). If data_rows and
+            data_columns are the same array, the diagonal holds the exact self-distances (0, pearson 1).
+        """
+
+        method = DistanceEngine.check_method(method)
+        rows, columns, norms_rows, norms_columns = DistanceEngine.prepare(data_rows, data_columns, method)
+        n_jobs = DistanceEngine.number_of_jobs(n_jobs)
+
+        distance_matrix = np.empty((rows.shape[0], columns.shape[0]), dtype=np.float64)
+
+        if n_jobs > 1 and rows.shape[0] > DistanceEngine.BLOCK_SIZE:
+            DistanceEngine.fill_parallel(distance_matrix, rows, columns, norms_rows, norms_columns, method, False, n_jobs)
+        else:
+            for start in range(0, rows.shape[0], DistanceEngine.BLOCK_SIZE):
+                DistanceEngine.fill_block(distance_matrix, rows, columns, norms_rows, norms_columns, method, start)
+
+        if data_rows is data_columns:
+            DistanceEngine.fill_self_distances(distance_matrix, method)
+
+        # same contract as FractionProfile.calculate_distance
+        if np.any(distance_matrix < 0):
+            raise ProfileNegativeDistanceError
+
+        return distance_matrix
+
+    @staticmethod
+    def calculate_condensed_distance_matrix(data: np.ndarray, method: str = "euclidean", n_jobs: int = None) -> CondensedDistanceMatrix:
+
+        """
+        Calculates the distance matrix of a profile matrix against itself. Only the upper triangle is computed
+        and stored, which halves both the work and the memory compared to calculate_distance_matrix(data, data).
+
+        Args:
+            data (np.ndarray): profiles, (no_profiles, no_fractions).
+            method (str): euclidean (default), manhattan, spearman or pearson.
+            n_jobs (int): number of worker processes. None or 1 computes serially, -1 uses all cores.
+
+        Returns:
+            CondensedDistanceMatrix: the upper triangle of the (no_profiles, no_profiles) distance matrix.
+        """
+
+        method = DistanceEngine.check_method(method)
+        rows, columns, norms_rows, norms_columns = DistanceEngine.prepare(data, data, method)
+        no_profiles = rows.shape[0]
+        n_jobs = DistanceEngine.number_of_jobs(n_jobs)
+
+        condensed = np.empty(no_profiles * (no_profiles - 1) // 2, dtype=np.float64)
+
+        if n_jobs > 1 and no_profiles > DistanceEngine.BLOCK_SIZE:
+            DistanceEngine.fill_parallel(condensed, rows, columns, norms_rows, norms_columns, method, True, n_jobs)
+        else:
+            for start in range(0, no_profiles, DistanceEngine.BLOCK_SIZE):
+                DistanceEngine.fill_condensed_block(condensed, rows, columns, norms_rows, norms_columns, method, start)
+
+        if np.any(condensed < 0):
+            raise ProfileNegativeDistanceError
+
+        # a profile has distance 0 to itself, but pearson (a correlation) is 1
+        return CondensedDistanceMatrix(condensed, no_profiles, 1.0 if method == "pearson" else 0.0)
+
+    @staticmethod
+    def masked_kernel(rows: np.ndarray, columns: np.ndarray, mask_rows: np.ndarray, mask_columns: np.ndarray,
+                      method: str) -> Tuple[np.ndarray, np.ndarray]:
+
+        """
+        Distances of one block of rows against all columns over the fractions observed in both profiles of a pair.
+        rows and columns hold zeros where the masks are False.
+
+        Returns:
+            Tuple: distances and number of commonly observed fractions per pair.
+        """
+
+        overlap = mask_rows @ mask_columns.T
+
+        match method:
+            case "euclidean":
+                # the sums of squares only run over the fractions observed in the other profile as well
+                squared = (rows ** 2) @ mask_columns.T + mask_rows @ (columns ** 2).T - 2 * (rows @ columns.T)
+                return np.sqrt(np.maximum(squared, 0, out=squared), out=squared), overlap
+
+            case "pearson":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    sum_rows, sum_columns = rows @ mask_columns.T, mask_rows @ columns.T
+                    covariance = rows @ columns.T - sum_rows * sum_columns / overlap
+                    variance_rows = (rows ** 2) @ mask_columns.T - sum_rows ** 2 / overlap
+                    variance_columns = mask_rows @ (columns ** 2).T - sum_columns ** 2 / overlap
+
+                    # profiles that are constant on the common fractions have no correlation
+                    variance_rows[variance_rows <= 0] = np.nan
+                    variance_columns[variance_columns <= 0] = np.nan
+                    correlation = covariance / np.sqrt(variance_rows * variance_columns)
+
+                return np.clip(correlation, -1, 1, out=correlation), overlap
+
+            case "manhattan" | "spearman":
+                block = np.empty((rows.shape[0], columns.shape[0]), dtype=np.float64)
+                nan_rows = np.where(mask_rows > 0, rows, np.nan)
+                nan_columns = np.where(mask_columns > 0, columns, np.nan)
+
+                # keep the broadcasted (rows, columns, fractions) temporaries at roughly BLOCK_SIZE**2 elements
+                step = max(1, DistanceEngine.BLOCK_SIZE ** 2 // max(1, columns.shape[0] * columns.shape[1]))
+                for start in range(0, rows.shape[0], step):
+                    left, right = np.broadcast_arrays(nan_rows[start:start + step, None, :], nan_columns[None, :, :])
+                    common = ~np.isnan(left) & ~np.isnan(right)
+
+                    if method == "manhattan":
+                        block[start:start + step] = np.abs(np.where(common, left - right, 0)).sum(axis=2)
+                    else:
+                        # sorted intensities over the common fractions, NaN (not common) sorts to the end on both sides
+                        difference = np.sort(np.where(common, left, np.nan), axis=2) - np.sort(np.where(common, right, np.nan), axis=2)
+                        block[start:start + step] = np.nansum(difference ** 2, axis=2)
+
+                if method == "spearman":
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        block *= 6 / (overlap * (overlap ** 2 - 1))
+
+                return block, overlap
+
+    @staticmethod
+    def calculate_masked_distance_matrix(data_rows: np.ndarray, data_columns: np.ndarray, method: str = "euclidean",
+                                         min_overlap: int = 1) -> np.ndarray:
+
+        """
+        Missing-value-aware version of calculate_distance_matrix. NaN marks a fraction that was not observed, and
+        every pair is compared over the fractions observed in both profiles. Masks, sums and dot products are
+        computed for a block of rows against all columns at once, so NaNs never fall back to a loop over pairs.
+        Without NaNs the result equals calculate_distance_matrix.
+
+        Args:
+            data_rows (np.ndarray): profiles of the row axis, (no_row_profiles, no_fractions), NaN for missing values.
+            data_columns (np.ndarray): profiles of the column axis, (no_column_profiles, no_fractions).
+            method (str): euclidean (default), manhattan, spearman or pearson.
+            min_overlap (int): minimum number of commonly observed fractions; pairs with fewer are NaN. Note that
+            euclidean and manhattan distances over fewer fractions are smaller, so a low threshold favours sparse profiles.
+            Spearman and pearson are undefined on a single common fraction and need at least 2 regardless of min_overlap.
+
+        Returns:
+            np.ndarray: distance matrix with the dimensions (no_row_profiles, no_column_profiles), NaN where the
+            overlap is below min_overlap or the measure is undefined (e.g. pearson on constant values).
+        """
+
+        method = DistanceEngine.check_method(method)
+
+        data_rows = np.asarray(data_rows, dtype=np.float64)
+        data_columns = np.asarray(data_columns, dtype=np.float64)
+
+        if data_rows.shape[1] != data_columns.shape[1]:
+            raise UnequalFractionsError
+
+        mask_rows = np.isfinite(data_rows)
+        mask_columns = np.isfinite(data_columns)
+
+        rows = np.where(mask_rows, data_rows, 0)
+        columns = np.where(mask_columns, data_columns, 0)
+
+        # centering keeps the sum identities accurate: euclidean and manhattan share one offset per fraction
+        # (translation invariant), pearson centers every profile by its own mean (shift invariant)
+        match method:
+            case "euclidean" | "manhattan":
+                offset = rows.sum(axis=0) / np.maximum(mask_rows.sum(axis=0), 1)
+                rows = np.where(mask_rows, rows - offset, 0)
+                columns = np.where(mask_columns, columns - offset, 0)
+            case "pearson":
+                rows = np.where(mask_rows, rows - rows.sum(axis=1, keepdims=True) / np.maximum(mask_rows.sum(axis=1, keepdims=True), 1), 0)
+                columns = np.where(mask_columns, columns - columns.sum(axis=1, keepdims=True) / np.maximum(mask_columns.sum(axis=1, keepdims=True), 1), 0)
+
+        mask_rows = mask_rows.astype(np.float64)
+        mask_columns = mask_columns.astype(np.float64)
+
+        distance_matrix = np.empty((rows.shape[0], columns.shape[0]), dtype=np.float64)
+
+        # rank and correlation measures divide by (overlap - 1) terms, a single common fraction would give inf
+        min_overlap = max(min_overlap, 2 if method in ("spearman", "pearson") else 1)
+
+        for start in range(0, rows.shape[0], DistanceEngine.BLOCK_SIZE):
+            stop = start + DistanceEngine.BLOCK_SIZE
+            block, overlap = DistanceEngine.masked_kernel(rows[start:stop], columns, mask_rows[start:stop], mask_columns, method)
+            block[overlap < min_overlap] = np.nan
+            distance_matrix[start:stop] = block
+
+        # same contract as calculate_distance_matrix
+        if np.any(distance_matrix < 0):
+            raise ProfileNegativeDistanceError
+
+        return distance_matrix
+
+    @staticmethod
+    def tile_size(no_fractions: int, memory_budget: int) -> int:
+
+        '''
+        Edge length of the square tiles such that one tile, its temporaries (about three tile sized arrays)
+        and the prepared input rows of the tile stay within the memory budget (bytes).
+        '''
+
+        # tile**2 * 8 bytes * (output + 2 temporaries) + 2 * tile * no_fractions * 8 bytes for the inputs
+        tile = int((-(2 * no_fractions) + np.sqrt(4 * no_fractions ** 2 + 4 * 3 * memory_budget / 8)) / (2 * 3))
+
+        return max(1, tile)
+
+    @staticmethod
+    def labels_path(path: str) -> str:
+        return os.path.splitext(path)[0] + ".labels.json"
+
+    @staticmethod
+    def calculate_distance_matrix_to_file(data_rows: np.ndarray, data_columns: np.ndarray, path: str, method: str = "euclidean",
+                                          row_labels: List[str] = None, column_labels: List[str] = None,
+                                          memory_budget: int = 256 * 1024 ** 2, progress: Callable[[int, int], None] = None) -> np.memmap:
+
+        """
+        Calculates the distance matrix tile by tile and writes it into a memory-mapped .npy file, so that
+        matrices larger than the available RAM can be computed. The labels are written to a JSON sidecar
+        next to the matrix (see labels_path).
+
+        Args:
+            data_rows (np.ndarray): profiles of the row axis, (no_row_profiles, no_fractions).
+            data_columns (np.ndarray): profiles of the column axis, (no_column_profiles, no_fractions).
+            path (str): location of the .npy file.
+            method (str): euclidean (default), manhattan, spearman or pearson.
+            row_labels (List[str]): optional labels of the rows, stored in the sidecar.
+            column_labels (List[str]): optional labels of the columns, stored in the sidecar.
+            memory_budget (int): working memory in bytes available for a single tile. Default is 256 MB.
+            progress (Callable[[int, int], None]): called with (finished_tiles, total_tiles) after every tile.
+
+        Returns:
+            np.memmap: the distance matrix, opened read-only.
+        """
+
+        method = DistanceEngine.check_method(method)
+        rows, columns, norms_rows, norms_columns = DistanceEngine.prepare(data_rows, data_columns, method)
+
+        tile = DistanceEngine.tile_size(rows.shape[1], memory_budget)
+        row_starts = range(0, rows.shape[0], tile)
+        column_starts = range(0, columns.shape[0], tile)
+        total_tiles = len(row_starts) * len(column_starts)
+
+        distance_matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(rows.shape[0], columns.shape[0]))
+
+        finished_tiles = 0
+
+        for row_start in row_starts:
+            row_stop = row_start + tile
+
+            for column_start in column_starts:
+                column_stop = column_start + tile
+
+                block = DistanceEngine.kernel(rows[row_start:row_stop], columns[column_start:column_stop],
+                                              None if norms_rows is None else norms_rows[row_start:row_stop],
+                                              None if norms_columns is None else norms_columns[column_start:column_stop], method)
+
+                if np.any(block < 0):
+                    raise ProfileNegativeDistanceError
+
+                distance_matrix[row_start:row_stop, column_start:column_stop] = block
+
+                finished_tiles += 1
+                if progress is not None:
+                    progress(finished_tiles, total_tiles)
+
+        if data_rows is data_columns:
+            DistanceEngine.fill_self_distances(distance_matrix, method)
+
+        distance_matrix.flush()
+        del distance_matrix
+
+        with open(DistanceEngine.labels_path(path), "w") as file:
+            json.dump({"method": method,
+                       "row_labels": None if row_labels is None else [str(label) for label in row_labels],
+                       "column_labels": None if column_labels is None else [str(label) for label in column_labels]}, file)
+
+        return np.load(path, mmap_mode="r")
+
+    @staticmethod
+    def load_distance_matrix(path: str, mmap_mode: str = "r") -> Tuple[np.memmap, List[str], List[str]]:
+
+        '''
+        Opens a distance matrix written by calculate_distance_matrix_to_file without reading it into memory.
+        Returns the memory-mapped matrix along with the row and column labels from the sidecar.
+        '''
+
+        distance_matrix = np.load(path, mmap_mode=mmap_mode)
+
+        with open(DistanceEngine.labels_path(path)) as file:
+            labels = json.load(file)
+
+        return distance_matrix, labels["row_labels"], labels["column_labels"]
+
+    @staticmethod
+    def calculate_profile_distances(profiles_row_axis: List['Profile'], profiles_column_axis: List['Profile'], method: str = "euclidean", symmetric: bool = None,
+                                    out_file: str = None, memory_budget: int = 256 * 1024 ** 2, progress: Callable[[int, int], None] = None,
+                                    n_jobs: int = None, cache: 'DistanceCache' = None, min_overlap: int = None) -> Tuple[np.ndarray, List[str], List[str]]:
+
+        '''
+        Aligns two profile collections (lists or ProfileSets) on the fraction axis of the row profiles and returns the
+        distance matrix along with the row and column labels.
+        If both axes are the same collection (detected when symmetric is None) a CondensedDistanceMatrix is returned.
+        If out_file is given, the full matrix is computed tile by tile into a memory-mapped file instead.
+        With a DistanceCache, results for the same profiles and method are looked up instead of computed again
+        (not used together with out_file, which already keeps the result on disk).
+        With min_overlap the profiles may contain NaNs and lack fractions: every pair is compared over its commonly
+        observed fractions (see calculate_masked_distance_matrix), pairs with fewer than min_overlap are NaN.
+        '''
+
+        fill_missing = min_overlap is not None
+
+        if out_file is not None:
+            if fill_missing:
+                raise ProfileError("min_overlap cannot be combined with out_file.")
+
+            rows = ProfileSet.objectify_w_profiles(profiles_row_axis)
+            # the same collection on both axes shares one array, so that the self-distances are exact
+            columns = rows if profiles_row_axis is profiles_column_axis else ProfileSet.objectify_w_profiles(profiles_column_axis, rows.fractions)
+
+            distance_matrix = DistanceEngine.calculate_distance_matrix_to_file(rows.data, columns.data, out_file, method, rows.iDs, columns.iDs,
+                                                                               memory_budget, progress)
+
+            return distance_matrix, list(rows.iDs), list(columns.iDs)
+
+        if symmetric is None:
+            symmetric = profiles_row_axis is profiles_column_axis
+
+        rows = ProfileSet.objectify_w_profiles(profiles_row_axis, fill_missing=fill_missing)
+        # masked results depend on min_overlap and are cached apart from the plain ones
+        cache_method = method if not fill_missing else f"{method}|min_overlap={min_overlap}"
+
+        if symmetric:
+
+            if profiles_row_axis is not profiles_column_axis and [profile.iD for profile in profiles_column_axis] != list(rows.iDs):
+                raise ProfileError("The symmetric mode requires the same profiles on the row and the column axis.")
+
+            def compute():
+                if fill_missing:
+                    matrix = DistanceEngine.calculate_masked_distance_matrix(rows.data, rows.data, method, min_overlap)
+                    condensed = CondensedDistanceMatrix(matrix[np.triu_indices(len(rows), 1)], len(rows),
+                                                        1.0 if method.lower() == "pearson" else 0.0)
+                    return condensed, list(rows.iDs), list(rows.iDs)
+
+                return DistanceEngine.calculate_condensed_distance_matrix(rows.data, method, n_jobs), list(rows.iDs), list(rows.iDs)
+
+            return compute() if cache is None else cache.get_or_compute(rows, rows, cache_method, True, compute)
+
+        columns = ProfileSet.objectify_w_profiles(profiles_column_axis, rows.fractions, fill_missing)
+
+        def compute():
+            if fill_missing:
+                return DistanceEngine.calculate_masked_distance_matrix(rows.data, columns.data, method, min_overlap), list(rows.iDs), list(columns.iDs)
+
+            return DistanceEngine.calculate_distance_matrix(rows.data, columns.data, method, n_jobs), list(rows.iDs), list(columns.iDs)
+
+        return compute() if cache is None else cache.get_or_compute(rows, columns, cache_method, False, compute)
+
+
+def _attach_shared(spec):
+
+    # (name, shape, dtype) -> (SharedMemory, array view); the handle has to stay alive while the view is used
+    if spec is None:
+        return None, None
+
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _fill_shared_blocks(specs, method: str, condensed: bool, starts: List[int]) -> None:
+
+    # module level so that it can be sent to the worker processes
+    attached = [_attach_shared(spec) for spec in specs]
+    rows, columns, norms_rows, norms_columns, out = [array for _, array in attached]
+
+    try:
+        for start in starts:
+            if condensed:
+                DistanceEngine.fill_condensed_block(out, rows, columns, norms_rows, norms_columns, method, start)
+            else:
+                DistanceEngine.fill_block(out, rows, columns, norms_rows, norms_columns, method, start)
+    finally:
+        del rows, columns, norms_rows, norms_columns, out
+        for block, _ in attached:
+            if block is not None:
+                block.close()
@@ -1,12 +1,15 @@
 import math
-import matplotlib.pyplot as plt
 from deprecated import deprecated
+from .OptionalDependency import OptionalDependency
 from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError
 from abc import ABC, abstractmethod
-from typing import Self, List, Dict, Set
+from typing import Self, List, Dict, Set, Tuple
 
 class FractionProfile(object):
     
+    # no per-instance __dict__ for plain profiles; subclasses without __slots__ still get one
+    __slots__ = ("iD", "information", "sampleData")
+    
     def __init__(self, iD: str, sample_information: Dict[str, str], sampleData: Dict[str, float]):
 
         self.iD: str = iD  # string from regular expression that contains all key information and is unique
@@ -30,9 +33,19 @@ class FractionProfile(object):
         return [cls(profile.iD, profile.information, profile.sampleData) for profile in profiles]
         
     @classmethod
-    def objectify_w_csv(cls, path)-> Self: 
-        # pipeline ToDo
-        return cls(iD, information, sampleData)
+    def objectify_w_csv(cls, path: str, column_pattern: str, iD_column: str, **kwargs) -> List[Self]: 
+        
+        """
+        Reads a wide table with ProfileFactory.create_fraction_profiles_with_csv and returns one object per profile.
+        For large tables prefer the ProfileSet returned by the factory, which avoids a dictionary per profile.
+        """
+        
+        # imported here, the factory itself depends on this module
+        from .ProfileFactory import ProfileFactory
+        
+        profile_set = ProfileFactory.create_fraction_profiles_with_csv(path, column_pattern, iD_column, **kwargs)
+        
+        return [cls(profile.iD, profile.information, dict(profile.sampleData)) for profile in profile_set]
     
     def calculate_distances(self: "FractionProfile", other: List["FractionProfile"], method: str = "euclidean") -> List[float]:
         
@@ -74,23 +87,26 @@ class FractionProfile(object):
             case _:
                 raise ProfileInvalidDistanceError
 
-    def _calculate_euclidean_distance(self: "FractionProfile", other: "FractionProfile") -> float:
+    def _aligned_values(self: "FractionProfile", other: "FractionProfile") -> Tuple[List[float], List[float]]:
 
-        distance_measure: float = 0
+        '''
+        intensities of both profiles in the fraction order of self. Raises UnequalFractionsError if the two profiles
+        were not measured on the same fractions.
+        '''
 
-        try:
-            
-            for key in self.sampleData.keys():
+        fractions: List[str] = list(self.sampleData.keys())
 
-                measure_a: float = self.sampleData.get(key)
-                measure_b: float = other.sampleData.get(key)
+        if len(fractions) != len(other.sampleData) or any(fraction not in other.sampleData for fraction in fractions):
+            missing = sorted(set(fractions).symmetric_difference(other.sampleData.keys()))
+            raise UnequalFractionsError(f"Profiles {self.iD} and {other.iD} differ in the fractions {missing}.")
 
-                distance_measure += (measure_a - measure_b) ** 2
-            
-            distance_measure = math.sqrt(distance_measure)
-            
-        except UnequalFractionsError as e:
-            print(f"UnequalFractionsError: {e}")
+        return [self.sampleData[fraction] for fraction in fractions], [other.sampleData[fraction] for fraction in fractions]
+
+    def _calculate_euclidean_distance(self: "FractionProfile", other: "FractionProfile") -> float:
+
+        list1, list2 = self._aligned_values(other)
+
+        distance_measure: float = math.sqrt(sum((measure_a - measure_b) ** 2 for measure_a, measure_b in zip(list1, list2)))
 
         if distance_measure < 0:
             raise ProfileNegativeDistanceError
@@ -99,19 +115,9 @@ class FractionProfile(object):
 
     def _calculate_manhattan_distance(self: "FractionProfile", other: "FractionProfile") -> float:
 
-        distance_measure: float = 0
+        list1, list2 = self._aligned_values(other)
 
-        try:
-            
-            for key in self.sampleData.keys():
-       
-                measure_a: float = self.sampleData.get(key)
-                measure_b: float = other.sampleData.get(key)
-                    
-                distance_measure += abs(measure_a - measure_b)
-                    
-        except UnequalFractionsError as e:
-            print(f"UnequalFractionsError: {e}")
+        distance_measure: float = sum(abs(measure_a - measure_b) for measure_a, measure_b in zip(list1, list2))
             
         if distance_measure < 0:
             raise ProfileNegativeDistanceError
@@ -120,17 +126,12 @@ class FractionProfile(object):
 
     def _calculate_pearson(self: "FractionProfile", other: "FractionProfile") -> float:
 
-        distance_measure: float = 0
-
-        list1: List[float]  = list(self.sampleData.values())
-        list2: List[float]  = list(other.sampleData.values())
+        # aligned by fraction, not by the insertion order of the two dictionaries
+        list1, list2 = self._aligned_values(other)
 
         avg1: float  = sum(list1) / len(list1)
         avg2: float  = sum(list2) / len(list2)
 
-        if len(list1) != len(list2):
-            raise UnequalFractionsError
-
         numerator: float = sum(
             [(list1[i] - avg1) * (list2[i] - avg2) for i in range(len(list1))])
         denominator: float = math.sqrt(
@@ -148,12 +149,8 @@ class FractionProfile(object):
 
     def _calculate_spearman(self: "FractionProfile", other: "FractionProfile") -> float:
 
-        distance_measure: float = 0
-        list1: List[float] = sorted(list(self.sampleData.values()))
-        list2: List[float] = sorted(list(other.sampleData.values()))
-
-        if len(list1) != len(list2):
-            raise UnequalFractionsError
+        list1, list2 = self._aligned_values(other)
+        list1, list2 = sorted(list1), sorted(list2)
 
         d_squared:  List[float] = [(val1 - val2) ** 2 for val1, val2 in zip(list1, list2)]
         n: int = len(list1)
@@ -168,6 +165,8 @@ class FractionProfile(object):
     @deprecated
     def plotter(self):
 
+        plt = OptionalDependency.load("matplotlib.pyplot")
+
         # Create the plot
         plt.figure(figsize=(10, 6))  # Set the figure size
         plt.plot(self.sampleData.keys(), self.sampleData.values(), '-o', markersize=10, markerfacecolor='blue',
@@ -0,0 +1,47 @@
+import weakref
+from typing import Self, List, Dict, Set, Tuple, Iterable
+
+
+class FractionSchema(object):
+
+    __slots__ = ("fractions", "index", "__weakref__")
+
+    # one schema per distinct fraction order, alive as long as a profile references it
+    _interned: 'weakref.WeakValueDictionary[Tuple[str], FractionSchema]' = weakref.WeakValueDictionary()
+
+    def __init__(self, fractions: Iterable[str]):
+
+        """
+        Ordered fraction axis shared by many profiles. Profiles measured on the same fractions reference one
+        interned schema (see intern) instead of each holding its own dictionary keys.
+
+        Args:
+            fractions (Iterable[str]): fraction labels in column order.
+        """
+
+        self.fractions: Tuple[str] = tuple(fractions)
+        self.index: Dict[str, int] = {fraction: position for position, fraction in enumerate(self.fractions)}
+
+    @classmethod
+    def intern(cls, fractions: Iterable[str]) -> Self:
+
+        '''
+        returns the shared schema for the given fraction order, creating it on first use.
+        '''
+
+        fractions = tuple(fractions)
+        schema = cls._interned.get(fractions)
+
+        if schema is None:
+            schema = cls._interned[fractions] = cls(fractions)
+
+        return schema
+
+    def __len__(self) -> int:
+        return len(self.fractions)
+
+    def __iter__(self):
+        return iter(self.fractions)
+
+    def __repr__(self) -> str:
+        return f"FractionSchema({list(self.fractions)})"
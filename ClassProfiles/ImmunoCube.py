@@ -0,0 +1,297 @@
+import numpy as np
+from collections.abc import Mapping
+from .ProfileSet import ProfileSet
+from .DistanceEngine import DistanceEngine
+from .ProfileErrors import ProfileError, UnequalFractionsError, FractionZeroDivisionError, EmptyProfileListError, ProfileNotFoundError, DuplicateProfileError
+from typing import Self, List, Dict, Set, Tuple, Hashable, Callable
+
+
+class ImmunoCube(object):
+
+    def __init__(self, data: np.ndarray, proteins: List[str], fractions: List[str], conditions: List[Tuple[str]],
+                 condition_keys: Tuple[str] = ("treatment", "replicate"), protein_key: str = "iD"):
+
+        """
+        Profiles aligned on three explicit axes: proteins x fractions x conditions, where a condition is a tuple of
+        information values (e.g. ("DIABZI", "1") for treatment and replicate). A protein that was not measured in a
+        condition holds NaN in every fraction. Selections on contiguous labels (sel, condition) return views on the
+        same array, and normalizations and distance matrices run over all conditions at once, e.g.
+
+            cube = ImmunoCube.from_profile_set(profile_set, condition_keys=("treatment", "replicate"))
+            cube = cube.normalize_sum()
+            movement = cube.movement(("DIABZI", "1"), ("DMSO", "1"), method="pearson")
+
+        Args:
+            data (np.ndarray): intensities with the dimensions (no_proteins, no_fractions, no_conditions).
+            proteins (List[str]): labels of the protein axis.
+            fractions (List[str]): labels of the fraction axis.
+            conditions (List[Tuple[str]]): labels of the condition axis, one value per condition key.
+            condition_keys (Tuple[str]): information keys the conditions are made of.
+            protein_key (str): information key that names the protein of a profile.
+
+        Raises:
+            ProfileError: If the number of labels does not match the shape of data.
+        """
+
+        self.data: np.ndarray = np.asarray(data, dtype=np.float64)
+
+        if self.data.ndim != 3:
+            raise ProfileError(f"ImmunoCube data has to be 3-D (proteins x fractions x conditions), got {self.data.ndim} dimension(s).")
+
+        self.proteins: List[str] = list(proteins)
+        self.fractions: List[str] = list(fractions)
+        self.conditions: List[Tuple[str]] = [tuple(condition) for condition in conditions]
+        self.condition_keys: Tuple[str] = tuple(condition_keys)
+        self.protein_key: str = protein_key
+
+        if self.data.shape != (len(self.proteins), len(self.fractions), len(self.conditions)):
+            raise ProfileError(f"Data of shape {self.data.shape} does not match {len(self.proteins)} proteins, "
+                               f"{len(self.fractions)} fractions and {len(self.conditions)} conditions.")
+
+        self.protein_index: Dict[str, int] = {protein: index for index, protein in enumerate(self.proteins)}
+        self.fraction_index: Dict[str, int] = {fraction: index for index, fraction in enumerate(self.fractions)}
+        self.condition_index: Dict[Tuple[str], int] = {condition: index for index, condition in enumerate(self.conditions)}
+
+    @classmethod
+    def from_profile_set(cls, profiles: List['Profile'], condition_keys: Tuple[str] = ("treatment", "replicate"),
+                         protein_key: str = "iD") -> Self:
+
+        """
+        Arranges a flat profile collection (list or ProfileSet) into a cube. The protein of a profile is taken from
+        information[protein_key], its condition from the information values of condition_keys.
+
+        Raises:
+            ProfileError: If a profile lacks the protein key or one of the condition keys.
+            DuplicateProfileError: If two profiles share the same protein and condition.
+        """
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles)
+        condition_keys = tuple(condition_keys)
+
+        try:
+            protein_labels = [information[protein_key] for information in profile_set.information]
+            condition_labels = [tuple(information[key] for key in condition_keys) for information in profile_set.information]
+        except KeyError as key:
+            raise ProfileError(f"Profile information has no key {key}.")
+
+        proteins: Dict[str, int] = {}
+        conditions: Dict[Tuple[str], int] = {}
+        protein_codes = np.fromiter((proteins.setdefault(protein, len(proteins)) for protein in protein_labels), dtype=np.int64, count=len(profile_set))
+        condition_codes = np.fromiter((conditions.setdefault(condition, len(conditions)) for condition in condition_labels), dtype=np.int64, count=len(profile_set))
+
+        cells = protein_codes * len(conditions) + condition_codes
+        if len(np.unique(cells)) != len(cells):
+            raise DuplicateProfileError("Several profiles share the same protein and condition.")
+
+        data = np.full((len(proteins), len(profile_set.fractions), len(conditions)), np.nan)
+        data[protein_codes, :, condition_codes] = profile_set.data
+
+        return cls(data, list(proteins), profile_set.fractions, list(conditions), condition_keys, protein_key)
+
+    def to_profile_set(self, drop_missing: bool = True) -> ProfileSet:
+
+        '''
+        flattens the cube back into a ProfileSet with one profile per protein and condition, named
+        "<protein>_<condition values joined by _>". Proteins not measured in a condition are dropped unless
+        drop_missing is False.
+        '''
+
+        # (proteins, fractions, conditions) -> (proteins * conditions, fractions), protein major
+        data = self.data.transpose(0, 2, 1).reshape(-1, len(self.fractions))
+        protein_positions, condition_positions = np.divmod(np.arange(data.shape[0]), len(self.conditions))
+
+        if drop_missing:
+            measured = ~np.all(np.isnan(data), axis=1)
+            data, protein_positions, condition_positions = data[measured], protein_positions[measured], condition_positions[measured]
+
+        iDs = [f"{self.proteins[protein]}_{'_'.join(map(str, self.conditions[condition]))}"
+               for protein, condition in zip(protein_positions, condition_positions)]
+        information = [{self.protein_key: self.proteins[protein], **dict(zip(self.condition_keys, self.conditions[condition]))}
+                       for protein, condition in zip(protein_positions, condition_positions)]
+
+        return ProfileSet(iDs, information, data, self.fractions)
+
+    def __repr__(self) -> str:
+        return f"ImmunoCube(no_proteins={len(self.proteins)}, no_fractions={len(self.fractions)}, no_conditions={len(self.conditions)})"
+
+    @property
+    def shape(self) -> tuple:
+        return self.data.shape
+
+    @staticmethod
+    def _positions(labels, index: Dict, axis: str):
+
+        '''
+        positions of the labels on an axis. Evenly spaced positions are returned as slice, so that numpy hands out
+        a view instead of a copy.
+        '''
+
+        try:
+            positions = [index[label] for label in labels]
+        except KeyError as label:
+            raise ProfileNotFoundError(f"{label} is not part of the {axis} axis.")
+
+        if not positions:
+            raise EmptyProfileListError(f"No {axis} selected.")
+
+        if len(positions) == 1:
+            return slice(positions[0], positions[0] + 1)
+
+        step = positions[1] - positions[0]
+        if step > 0 and all(following - current == step for current, following in zip(positions, positions[1:])):
+            return slice(positions[0], positions[-1] + 1, step)
+
+        return np.asarray(positions)
+
+    def match_conditions(self, **criteria) -> List[Tuple[str]]:
+
+        '''
+        conditions whose values match all criteria, e.g. cube.match_conditions(treatment="DMSO").
+        '''
+
+        try:
+            columns = [(self.condition_keys.index(key), value) for key, value in criteria.items()]
+        except ValueError:
+            raise ProfileError(f"Conditions are made of {self.condition_keys}, got {tuple(criteria)}.")
+
+        return [condition for condition in self.conditions if all(condition[column] == value for column, value in columns)]
+
+    def sel(self, proteins: List[str] = None, fractions: List[str] = None, conditions: List[Tuple[str]] = None, **criteria) -> Self:
+
+        '''
+        selects by axis labels. Conditions can also be selected by their values, e.g. cube.sel(treatment="DMSO").
+        The result shares memory with this cube as long as every selection is evenly spaced along its axis.
+        '''
+
+        if criteria:
+            matched = self.match_conditions(**criteria)
+            conditions = matched if conditions is None else [condition for condition in map(tuple, conditions) if condition in matched]
+
+        protein_positions = slice(None) if proteins is None else self._positions(proteins, self.protein_index, "protein")
+        fraction_positions = slice(None) if fractions is None else self._positions(fractions, self.fraction_index, "fraction")
+        condition_positions = slice(None) if conditions is None else self._positions(map(tuple, conditions), self.condition_index, "condition")
+
+        # index one axis after the other, mixing several integer arrays in one step would pair them up
+        data = self.data[protein_positions][:, fraction_positions][:, :, condition_positions]
+
+        return ImmunoCube(data,
+                          np.asarray(self.proteins, dtype=object)[protein_positions].tolist(),
+                          np.asarray(self.fractions, dtype=object)[fraction_positions].tolist(),
+                          [self.conditions[position] for position in np.arange(len(self.conditions))[condition_positions]],
+                          self.condition_keys, self.protein_key)
+
+    def condition(self, condition: Tuple[str]) -> np.ndarray:
+
+        '''
+        (no_proteins, no_fractions) view of the intensities of one condition.
+        '''
+
+        try:
+            return self.data[:, :, self.condition_index[tuple(condition)]]
+        except KeyError:
+            raise ProfileNotFoundError(f"{condition} is not part of the condition axis.")
+
+    def protein(self, protein: str) -> np.ndarray:
+
+        '''
+        (no_fractions, no_conditions) view of the profiles of one protein across all conditions.
+        '''
+
+        try:
+            return self.data[self.protein_index[protein]]
+        except KeyError:
+            raise ProfileNotFoundError(f"{protein} is not part of the protein axis.")
+
+    def measured(self) -> np.ndarray:
+
+        '''
+        (no_proteins, no_conditions) mask of the proteins that have intensities in every fraction of a condition.
+        '''
+
+        return ~np.any(np.isnan(self.data), axis=1)
+
+    def normalize_sum(self) -> Self:
+
+        '''
+        SumProfile normalization of every protein in every condition at once: intensities divided by the sum
+        over the fractions. Profiles summing up to zero become NaN.
+        '''
+
+        sums = self.data.sum(axis=1, keepdims=True)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            data = np.where(sums != 0, self.data / sums, np.nan)
+
+        return ImmunoCube(data, self.proteins, self.fractions, self.conditions, self.condition_keys, self.protein_key)
+
+    def normalize_reference(self, reference, logarithm: Callable = np.log) -> Self:
+
+        '''
+        ReferenceProfile normalization of every protein in every condition at once: logarithm(intensity / reference).
+        The reference is a profile (or a fraction -> value dictionary) or an array with one value per fraction.
+        logarithm has to work on arrays (np.log, np.log2, ...).
+        '''
+
+        if hasattr(reference, "sampleData"):
+            reference = reference.sampleData
+
+        # dictionaries and the sampleData views of ProfileSet rows and CompactProfiles, matched on the fraction labels
+        if isinstance(reference, Mapping):
+            if sorted(reference) != sorted(self.fractions):
+                raise UnequalFractionsError
+            reference = [reference[fraction] for fraction in self.fractions]
+
+        reference = np.asarray(reference, dtype=np.float64)
+
+        if reference.shape != (len(self.fractions),):
+            raise UnequalFractionsError
+
+        if np.any(reference == 0):
+            raise FractionZeroDivisionError(dict(zip(self.fractions, reference)))
+
+        data = logarithm(self.data / reference[None, :, None])
+
+        return ImmunoCube(data, self.proteins, self.fractions, self.conditions, self.condition_keys, self.protein_key)
+
+    def distance_matrix(self, condition: Tuple[str], method: str = "euclidean", n_jobs: int = None) -> np.ndarray:
+
+        '''
+        (no_proteins, no_proteins) distance matrix between all proteins in one condition. Rows and columns of
+        proteins that were not measured in the condition are NaN.
+        '''
+
+        data = self.condition(condition)
+        measured = ~np.any(np.isnan(data), axis=1)
+
+        if np.all(measured):
+            return DistanceEngine.calculate_distance_matrix(data, data, method, n_jobs)
+
+        distance_matrix = np.full((len(self.proteins), len(self.proteins)), np.nan)
+        data = data[measured]
+        distance_matrix[np.ix_(measured, measured)] = DistanceEngine.calculate_distance_matrix(data, data, method, n_jobs)
+
+        return distance_matrix
+
+    def distance_matrices(self, method: str = "euclidean", conditions: List[Tuple[str]] = None, n_jobs: int = None) -> np.ndarray:
+
+        '''
+        stacked distance matrices of the given (default: all) conditions, (no_conditions, no_proteins, no_proteins).
+        Rows and columns share the order of cube.proteins, so matrices of different conditions can be compared directly.
+        '''
+
+        conditions = self.conditions if conditions is None else conditions
+        distance_matrices = np.empty((len(conditions), len(self.proteins), len(self.proteins)), dtype=np.float64)
+
+        for position, condition in enumerate(conditions):
+            distance_matrices[position] = self.distance_matrix(condition, method, n_jobs)
+
+        return distance_matrices
+
+    def movement(self, treatment: Tuple[str], control: Tuple[str], method: str = "euclidean", n_jobs: int = None) -> np.ndarray:
+
+        '''
+        movement matrix between two conditions, i.e. distance_matrix(treatment) - distance_matrix(control), like
+        ProfileManager.get_movement_matrix. Rows and columns follow cube.proteins.
+        '''
+
+        return self.distance_matrix(treatment, method, n_jobs) - self.distance_matrix(control, method, n_jobs)
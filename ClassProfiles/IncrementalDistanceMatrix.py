@@ -0,0 +1,211 @@
+import numpy as np
+from .ProfileSet import ProfileSet
+from .ProfileIDIndex import ProfileIDIndex
+from .DistanceEngine import DistanceEngine
+from .ProfileErrors import ProfileError, UnequalFractionsError, EmptyProfileListError
+from typing import Self, List, Dict, Set, Tuple
+
+
+class IncrementalDistanceMatrix(object):
+
+    def __init__(self, profiles_row_axis: List['Profile'], profiles_column_axis: List['Profile'] = None, method: str = "euclidean",
+                 n_jobs: int = None, growth: float = 1.25, capacity: int = None):
+
+        """
+        Distance matrix that is kept up to date while profiles are added or removed. Added profiles only cost the
+        distances of the new pairs; removed profiles are compacted out of the storage without computing anything.
+        The matrix lives in a buffer with some spare rows and columns (growth), so that small additions do not copy
+        the whole matrix.
+
+            distances = IncrementalDistanceMatrix(profiles, method="pearson")
+            distances.add_profiles(new_profiles)
+            distances.remove_profiles(contaminant_iDs)
+            matrix, row_labels, column_labels = distances.result()
+
+        Args:
+            profiles_row_axis (List[Profile]): profiles (list or ProfileSet) of the row axis.
+            profiles_column_axis (List[Profile]): profiles of the column axis. If None (or the same collection as
+            the row axis) the matrix is symmetric and additions/removals apply to both axes.
+            method (str): euclidean (default), manhattan, spearman or pearson.
+            n_jobs (int): worker processes for the distance computations, see DistanceEngine.calculate_distance_matrix.
+            growth (float): factor by which the buffer grows when it is full.
+            capacity (int): number of profiles per axis the buffer is allocated for up front. Reserving room for the
+            expected additions avoids copying the matrix when they arrive.
+        """
+
+        self.method: str = DistanceEngine.check_method(method)
+        self.n_jobs: int = n_jobs
+        self.growth: float = max(1.0, growth)
+        self.symmetric: bool = profiles_column_axis is None or profiles_column_axis is profiles_row_axis
+
+        self.rows: ProfileSet = ProfileSet.objectify_w_profiles(profiles_row_axis)
+        self.columns: ProfileSet = self.rows if self.symmetric else ProfileSet.objectify_w_profiles(profiles_column_axis, self.rows.fractions)
+
+        self.row_index: ProfileIDIndex = ProfileIDIndex(list(self.rows.iDs))
+        self.column_index: ProfileIDIndex = self.row_index if self.symmetric else ProfileIDIndex(list(self.columns.iDs))
+
+        capacity = capacity or 0
+        self._buffer: np.ndarray = np.empty((max(capacity, len(self.rows)), max(capacity, len(self.columns))), dtype=np.float64)
+        self._buffer[:len(self.rows), :len(self.columns)] = self._distances(self.rows.data, self.columns.data)
+
+    def __repr__(self) -> str:
+        return f"IncrementalDistanceMatrix(shape={self.shape}, method={self.method!r}, symmetric={self.symmetric})"
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.rows), len(self.columns)
+
+    @property
+    def matrix(self) -> np.ndarray:
+
+        '''
+        view of the current (no_rows, no_columns) matrix. It is only valid until the next addition or removal.
+        '''
+
+        return self._buffer[:len(self.rows), :len(self.columns)]
+
+    @property
+    def row_labels(self) -> List[str]:
+        return list(self.rows.iDs)
+
+    @property
+    def column_labels(self) -> List[str]:
+        return list(self.columns.iDs)
+
+    def result(self) -> Tuple[np.ndarray, List[str], List[str]]:
+
+        '''
+        copy of the matrix along with the row and column labels, like ProfileManager.get_distance_matrix.
+        '''
+
+        return self.matrix.copy(), self.row_labels, self.column_labels
+
+    def _distances(self, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        return DistanceEngine.calculate_distance_matrix(rows, columns, self.method, self.n_jobs)
+
+    def _reserve(self, no_rows: int, no_columns: int) -> None:
+
+        # grow the buffer by the growth factor once it cannot hold the new shape
+        capacity_rows, capacity_columns = self._buffer.shape
+
+        if no_rows <= capacity_rows and no_columns <= capacity_columns:
+            return
+
+        buffer = np.empty((max(no_rows, int(capacity_rows * self.growth) if no_rows > capacity_rows else capacity_rows),
+                           max(no_columns, int(capacity_columns * self.growth) if no_columns > capacity_columns else capacity_columns)))
+        buffer[:len(self.rows), :len(self.columns)] = self.matrix
+        self._buffer = buffer
+
+    def _align(self, profiles: List['Profile']) -> ProfileSet:
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles, self.rows.fractions)
+
+        if not len(profile_set):
+            raise EmptyProfileListError
+
+        return profile_set
+
+    def add_profiles(self, profiles: List['Profile']) -> None:
+
+        '''
+        adds profiles to both axes of a symmetric matrix. Only new x old and new x new distances are computed.
+        '''
+
+        if not self.symmetric:
+            raise ProfileError("add_profiles needs a symmetric matrix, use add_rows or add_columns instead.")
+
+        added = self._align(profiles)
+        old, new = len(self.rows), len(self.rows) + len(added)
+
+        # distances first: if they raise, index, buffer and profiles are left untouched
+        block = self._distances(added.data, self.rows.data)
+        new_block = self._distances(added.data, added.data)
+        self.row_index.add(list(added.iDs))
+
+        # the new x old block is computed once and mirrored
+        self._reserve(new, new)
+        self._buffer[old:new, :old] = block
+        self._buffer[:old, old:new] = block.T
+        self._buffer[old:new, old:new] = new_block
+
+        self.rows = self.columns = ProfileSet.concatenate([self.rows, added])
+
+    def add_rows(self, profiles: List['Profile']) -> None:
+
+        '''
+        adds profiles to the row axis of a non-symmetric matrix, computing their distances to all columns.
+        '''
+
+        if self.symmetric:
+            return self.add_profiles(profiles)
+
+        added = self._align(profiles)
+        block = self._distances(added.data, self.columns.data)
+        self.row_index.add(list(added.iDs))
+
+        old = len(self.rows)
+        self._reserve(old + len(added), len(self.columns))
+        self._buffer[old:old + len(added), :len(self.columns)] = block
+
+        self.rows = ProfileSet.concatenate([self.rows, added])
+
+    def add_columns(self, profiles: List['Profile']) -> None:
+
+        '''
+        adds profiles to the column axis of a non-symmetric matrix, computing their distances to all rows.
+        '''
+
+        if self.symmetric:
+            return self.add_profiles(profiles)
+
+        added = self._align(profiles)
+        block = self._distances(self.rows.data, added.data)
+        self.column_index.add(list(added.iDs))
+
+        old = len(self.columns)
+        self._reserve(len(self.rows), old + len(added))
+        self._buffer[:len(self.rows), old:old + len(added)] = block
+
+        self.columns = ProfileSet.concatenate([self.columns, added])
+
+    def _compact(self, keep_rows: np.ndarray, keep_columns: np.ndarray) -> None:
+
+        # move the surviving rows and columns to the front of the buffer, nothing is recomputed
+        self._buffer[:len(keep_rows), :len(keep_columns)] = self.matrix[np.ix_(keep_rows, keep_columns)]
+
+    def remove_profiles(self, profile_iDs: List[str]) -> None:
+
+        '''
+        removes profiles from both axes of a symmetric matrix. Raises ProfileNotFoundError for unknown iDs.
+        '''
+
+        if not self.symmetric:
+            raise ProfileError("remove_profiles needs a symmetric matrix, use remove_rows or remove_columns instead.")
+
+        keep = self.row_index.remaining_positions(profile_iDs)
+        self._compact(keep, keep)
+
+        self.rows = self.columns = self.rows.subset(keep)
+        self.row_index = self.column_index = ProfileIDIndex(list(self.rows.iDs))
+
+    def remove_rows(self, profile_iDs: List[str]) -> None:
+
+        if self.symmetric:
+            return self.remove_profiles(profile_iDs)
+
+        keep = self.row_index.remaining_positions(profile_iDs)
+        self._compact(keep, np.arange(len(self.columns)))
+
+        self.rows = self.rows.subset(keep)
+        self.row_index = ProfileIDIndex(list(self.rows.iDs))
+
+    def remove_columns(self, profile_iDs: List[str]) -> None:
+
+        if self.symmetric:
+            return self.remove_profiles(profile_iDs)
+
+        keep = self.column_index.remaining_positions(profile_iDs)
+        self._compact(np.arange(len(self.rows)), keep)
+
+        self.columns = self.columns.subset(keep)
+        self.column_index = ProfileIDIndex(list(self.columns.iDs))
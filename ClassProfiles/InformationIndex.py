@@ -0,0 +1,251 @@
+import numpy as np
+from .ProfileErrors import ProfileNotFoundError
+from typing import Self, List, Dict, Tuple, Hashable
+
+
+class InformationIndex(object):
+
+    def __init__(self, information: List[Dict[str, str]], keys: List[str] = None):
+
+        """
+        Inverted index over the profile.information dictionaries of a collection. For every information key it
+        keeps a posting (sorted array of positions) per value and a dictionary-encoded column (one integer code
+        per position), so that
+
+            - key == value is a lookup of the posting,
+            - AND starts from the smallest posting and filters it through the code columns of the other keys,
+            - OR is the union of the postings.
+
+        Positions are stable: removed profiles are only marked as removed until compact() is called.
+        Added profiles are written into buffers that grow by doubling, so adding m profiles costs O(m) amortized.
+
+        Args:
+            information (List[Dict[str, str]]): information dictionaries, in the order of the collection.
+            keys (List[str]): keys to index. If None, every key that occurs in information is indexed. Keys that
+            occur in none of the dictionaries are not indexed, looking them up raises KeyError.
+        """
+
+        # without explicit keys, keys that only show up in profiles added later are indexed as well
+        self.index_all_keys: bool = keys is None
+
+        present = dict.fromkeys(key for entry in information for key in entry)
+        keys = list(present) if keys is None else [key for key in keys if key in present]
+
+        # the first size entries of the buffers are in use, the rest is spare room for added profiles
+        self.size: int = len(information)
+        self.capacity: int = self.size
+        self._alive: np.ndarray = np.ones(self.size, dtype=bool)
+        self.no_alive: int = self.size
+
+        self.codes: Dict[str, Dict[Hashable, int]] = {}  # key -> value -> code
+        self.values: Dict[str, List[Hashable]] = {}  # key -> code -> value
+        self.columns: Dict[str, np.ndarray] = {}  # key -> code per position (buffer), -1 if the profile has no such key
+        self.postings: Dict[str, Dict[Hashable, np.ndarray]] = {}  # key -> value -> sorted positions (buffer)
+        self.posting_sizes: Dict[str, Dict[Hashable, int]] = {}  # key -> value -> used length of the posting buffer
+
+        for key in keys:
+            self._index_key(key, [entry.get(key) for entry in information])
+
+    @classmethod
+    def objectify_w_profiles(cls, profiles: List['Profile'], keys: List[str] = None) -> Self:
+        return cls([profile.information for profile in profiles], keys)
+
+    def _index_key(self, key: str, values: List[Hashable]) -> None:
+
+        codes: Dict[Hashable, int] = {}
+        column = np.fromiter((-1 if value is None else codes.setdefault(value, len(codes)) for value in values), dtype=np.int64, count=len(values))
+
+        # one stable sort groups the positions of every value, each group is already in ascending order
+        order = np.argsort(column, kind="stable")
+        bounds = np.searchsorted(column[order], np.arange(len(codes) + 1))
+
+        self.codes[key] = codes
+        self.values[key] = list(codes)
+        self.columns[key] = np.concatenate((column, np.full(self.capacity - len(values), -1, dtype=np.int64)))
+        self.postings[key] = {value: order[bounds[code]:bounds[code + 1]] for value, code in codes.items()}
+        self.posting_sizes[key] = {value: len(posting) for value, posting in self.postings[key].items()}
+
+    def __len__(self) -> int:
+        return self.no_alive
+
+    @property
+    def alive(self) -> np.ndarray:
+
+        '''
+        True for every position that was not removed (view, valid until the next add).
+        '''
+
+        return self._alive[:self.size]
+
+    def column(self, key: str) -> np.ndarray:
+        return self.columns[key][:self.size]
+
+    def posting(self, key: str, value: Hashable) -> np.ndarray:
+
+        '''
+        positions of the profiles with information[key] == value. Raises KeyError for keys that are not indexed.
+        '''
+
+        posting = self.postings[key].get(value)
+
+        if posting is None:
+            return np.empty(0, dtype=np.int64)
+
+        return posting[:self.posting_sizes[key][value]]
+
+    def _set_posting(self, key: str, value: Hashable, posting: np.ndarray) -> None:
+        self.postings[key][value] = posting
+        self.posting_sizes[key][value] = len(posting)
+
+    def count(self, key: str, value: Hashable) -> int:
+        return len(self.posting(key, value))
+
+    def filter(self, positions: np.ndarray, key: str, values: List[Hashable]) -> np.ndarray:
+
+        '''
+        keeps the positions whose information[key] is one of values.
+        '''
+
+        codes = [self.codes[key][value] for value in values if value in self.codes[key]]
+        column = self.columns[key][positions]
+
+        if len(codes) == 1:
+            return positions[column == codes[0]]
+
+        return positions[np.isin(column, codes)]
+
+    def intersection(self, conditions: List[Tuple[str, Hashable]]) -> np.ndarray:
+
+        '''
+        positions that fulfil all (key, value) equality conditions, in ascending order.
+        '''
+
+        if not conditions:
+            return np.flatnonzero(self.alive)
+
+        # most selective condition first, the others only have to look at its survivors
+        conditions = sorted(conditions, key=lambda condition: self.count(*condition))
+        positions = self.posting(*conditions[0])
+
+        for key, value in conditions[1:]:
+            if len(positions) == 0:
+                break
+            positions = self.filter(positions, key, [value])
+
+        return positions
+
+    def union(self, conditions: List[Tuple[str, Hashable]]) -> np.ndarray:
+
+        '''
+        positions that fulfil at least one (key, value) equality condition, in ascending order.
+        '''
+
+        postings = [self.posting(key, value) for key, value in conditions]
+
+        if not postings:
+            return np.empty(0, dtype=np.int64)
+
+        return np.unique(np.concatenate(postings))
+
+    @staticmethod
+    def query_conditions(search_query: Dict[str, str]) -> List[Tuple[str, Hashable]]:
+
+        # {"PG": [A, B], "treatment": "DMSO"} -> [("PG", A), ("PG", B), ("treatment", "DMSO")]
+        conditions: List[Tuple[str, Hashable]] = []
+
+        for keyword, target_value in search_query.items():
+            if isinstance(target_value, list):
+                conditions.extend((keyword, value) for value in target_value)
+            else:
+                conditions.append((keyword, target_value))
+
+        return conditions
+
+    def add(self, information: Dict[str, str]) -> int:
+
+        '''
+        appends the information of a new profile and returns its position.
+        '''
+
+        position = self.size
+
+        # buffers double when full, so that a series of additions copies every entry only O(1) times on average
+        if self.size == self.capacity:
+            self.capacity = max(16, 2 * self.capacity)
+            self._alive = np.concatenate((self._alive, np.zeros(self.capacity - self.size, dtype=bool)))
+            for key, column in self.columns.items():
+                self.columns[key] = np.concatenate((column, np.full(self.capacity - self.size, -1, dtype=np.int64)))
+
+        if self.index_all_keys:
+            for key in information:
+                if key not in self.codes:
+                    self._index_key(key, [None] * position)
+
+        self.size += 1
+        self.no_alive += 1
+        self._alive[position] = True
+
+        for key, codes in self.codes.items():
+            value = information.get(key)
+
+            if value is None:
+                self.columns[key][position] = -1
+                continue
+
+            if value not in codes:
+                codes[value] = len(codes)
+                self.values[key].append(value)
+                self._set_posting(key, value, np.empty(0, dtype=np.int64))
+
+            used, posting = self.posting_sizes[key][value], self.postings[key][value]
+            if used == len(posting):
+                posting = self.postings[key][value] = np.concatenate((posting[:used], np.empty(max(4, used), dtype=np.int64)))
+
+            posting[used] = position
+            self.posting_sizes[key][value] = used + 1
+            self.columns[key][position] = codes[value]
+
+        return position
+
+    def remove(self, positions: List[int]) -> None:
+
+        '''
+        marks profiles as removed. Their positions are not reused until compact() is called.
+        '''
+
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+
+        if np.any(~self.alive[positions]):
+            raise ProfileNotFoundError("Some of the positions were already removed from the index.")
+
+        self.alive[positions] = False
+        self.no_alive -= len(positions)
+
+        for key, column in self.columns.items():
+            for code in np.unique(column[positions]):
+                if code < 0:
+                    continue
+                value = self.values[key][code]
+                posting = self.posting(key, value)
+                self._set_posting(key, value, posting[self.alive[posting]])
+            column[positions] = -1
+
+    def compact(self) -> np.ndarray:
+
+        '''
+        drops removed profiles so that positions match the compacted collection again.
+        Returns, for every old position, its new position (-1 for removed profiles).
+        '''
+
+        new_positions = np.cumsum(self.alive) - 1
+        new_positions[~self.alive] = -1
+
+        for key in self.columns:
+            self.columns[key] = self.column(key)[self.alive]
+            for value in self.postings[key]:
+                self._set_posting(key, value, new_positions[self.posting(key, value)])
+
+        self.size = self.capacity = self.no_alive
+        self._alive = np.ones(self.size, dtype=bool)
+
+        return new_positions
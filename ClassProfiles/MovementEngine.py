@@ -0,0 +1,161 @@
+import numpy as np
+from .ProfileIDIndex import ProfileIDIndex
+from .ProfileErrors import ProfileError, ProfileNotFoundError
+from typing import Self, List, Dict, Set, Tuple
+
+
+class MovementEngine(object):
+
+    def __init__(self, matrix1: np.ndarray, matrix2: np.ndarray, row_labels: List[str], col_labels: List[str]):
+
+        """
+        Movement between two distance matrices with the same labels (e.g. control = matrix1, treatment = matrix2),
+        computed once as matrix2 - matrix1. Negative movement means two proteins moved closer together after
+        treatment (a gained neighbour), positive movement that they moved apart (a lost neighbour).
+        Targets are resolved through a hash index, and all-protein summaries are single array operations:
+
+            engine = MovementEngine(control_matrix, treatment_matrix, labels, labels)
+            engine.movement_row("STING1")
+            ranking = engine.ranking(by="absolute")
+            gained = engine.top_k(10, direction="gained")
+
+        Args:
+            matrix1 (np.ndarray): distance matrix of the reference condition (ndarray, memmap or CondensedDistanceMatrix).
+            matrix2 (np.ndarray): distance matrix of the compared condition, same shape and labels.
+            row_labels (List[str]): labels of the rows.
+            col_labels (List[str]): labels of the columns.
+        """
+
+        self.matrix1: np.ndarray = np.asarray(matrix1)
+        self.matrix2: np.ndarray = np.asarray(matrix2)
+
+        if self.matrix1.shape != self.matrix2.shape or self.matrix1.shape != (len(row_labels), len(col_labels)):
+            raise ProfileError(f"Matrices of shape {self.matrix1.shape} and {self.matrix2.shape} do not match "
+                               f"{len(row_labels)} row and {len(col_labels)} column labels.")
+
+        self.movement: np.ndarray = self.matrix2 - self.matrix1
+
+        self.row_labels: List[str] = list(row_labels)
+        self.col_labels: List[str] = list(col_labels)
+
+        # like list.index, the first occurrence of a label wins
+        self.row_index: ProfileIDIndex = ProfileIDIndex(self.row_labels, check_duplicates=False)
+        self.col_index: ProfileIDIndex = ProfileIDIndex(self.col_labels, check_duplicates=False)
+
+        # cells where a protein is compared with itself, left out of summaries and rankings
+        self_rows = np.flatnonzero(self.col_index.contains(self.row_labels))
+        self.self_cells: Tuple[np.ndarray, np.ndarray] = (self_rows, self.col_index.get_positions([self.row_labels[row] for row in self_rows]))
+
+    def __repr__(self) -> str:
+        return f"MovementEngine(shape={self.movement.shape})"
+
+    def movement_row(self, target_of_interest: str):
+
+        '''
+        movement of one protein (row) to all columns, in the format of ProfileManager.get_movement:
+        movement, matrix1 row, matrix2 row, column labels, target.
+        '''
+
+        index = self.row_index.position(target_of_interest)
+
+        return self.movement[index], self.matrix1[index], self.matrix2[index], self.col_labels, target_of_interest
+
+    def movement_column(self, target_of_interest: str):
+
+        index = self.col_index.position(target_of_interest)
+
+        return self.movement[:, index], self.matrix1[:, index], self.matrix2[:, index], self.row_labels, target_of_interest
+
+    def _masked(self, fill: float) -> np.ndarray:
+
+        movement = self.movement.copy()
+        movement[self.self_cells] = fill
+
+        return movement
+
+    def net_movement(self) -> np.ndarray:
+
+        '''
+        sum of the movement of every row protein to all other proteins (negative: moved closer to the others overall).
+        '''
+
+        return np.nansum(self._masked(0.0), axis=1)
+
+    def absolute_movement(self) -> np.ndarray:
+
+        '''
+        mean absolute movement of every row protein to all other proteins, a direction-free relocation score.
+        '''
+
+        movement = np.abs(self._masked(np.nan))
+
+        return np.nanmean(movement, axis=1)
+
+    def summary(self) -> Dict[str, np.ndarray]:
+
+        '''
+        columnar per-protein summary: labels, net movement, mean absolute movement, and the strongest gained
+        (most negative) and lost (most positive) movement.
+        '''
+
+        movement = self._masked(np.nan)
+
+        return {"labels": np.asarray(self.row_labels, dtype=object),
+                "net": np.nansum(movement, axis=1),
+                "absolute": np.nanmean(np.abs(movement), axis=1),
+                "max_gained": np.nanmin(movement, axis=1),
+                "max_lost": np.nanmax(movement, axis=1)}
+
+    def ranking(self, by: str = "absolute") -> List[Tuple[str, float]]:
+
+        '''
+        row proteins ordered from strongest to weakest relocation, by "absolute" (mean absolute movement)
+        or "net" (largest |net movement|).
+        '''
+
+        match by:
+            case "absolute":
+                scores = self.absolute_movement()
+                order = np.argsort(-scores, kind="stable")
+            case "net":
+                scores = self.net_movement()
+                order = np.argsort(-np.abs(scores), kind="stable")
+            case _:
+                raise ProfileError("Accepted arguments are absolute & net")
+
+        return [(self.row_labels[position], float(scores[position])) for position in order]
+
+    def top_k(self, k: int = 10, direction: str = "gained") -> Dict[str, List[Tuple[str, float]]]:
+
+        '''
+        for every row protein the k columns with the most negative ("gained" neighbours) or most positive ("lost"
+        neighbours) movement, ordered by strength. Returns {row label: [(column label, movement), ...]}.
+        '''
+
+        positions, values = self.top_k_positions(k, direction)
+
+        return {label: [(self.col_labels[column], float(value)) for column, value in zip(row_positions, row_values) if np.isfinite(value)]
+                for label, row_positions, row_values in zip(self.row_labels, positions, values)}
+
+    def top_k_positions(self, k: int = 10, direction: str = "gained") -> Tuple[np.ndarray, np.ndarray]:
+
+        '''
+        array version of top_k: (no_rows, k) column positions and movement values.
+        '''
+
+        if direction not in ("gained", "lost"):
+            raise ProfileError("Accepted arguments are gained & lost")
+
+        # search for the smallest values in both cases: lost neighbours are the smallest negated movements
+        scores = self._masked(np.inf) if direction == "gained" else -self._masked(-np.inf)
+        scores[np.isnan(scores)] = np.inf
+
+        k = min(k, scores.shape[1])
+        candidates = np.argpartition(scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+        positions = np.take_along_axis(candidates, order, axis=1)
+
+        values = np.take_along_axis(self.movement, positions, axis=1).astype(np.float64)
+        values[~np.isfinite(np.take_along_axis(scores, positions, axis=1))] = np.nan
+
+        return positions, values
@@ -0,0 +1,233 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from .ImmunoCube import ImmunoCube
+from .DistanceEngine import DistanceEngine
+from .ProfileErrors import ProfileError, EmptyProfileListError
+from typing import Self, List, Dict, Set, Tuple
+
+
+class MovementTest(object):
+
+    STATISTICS: Tuple[str] = ("euclidean", "standardized")
+    METHODS: Tuple[str] = ("permutation", "bootstrap")
+
+    # resamples per task; fixed, so that the seeds of the tasks and therefore the results do not depend on n_jobs
+    CHUNK_SIZE: int = 16
+
+    def __init__(self, profiles: List['Profile'], control: str, treatment: str, condition_key: str = "treatment",
+                 replicate_key: str = "replicate", protein_key: str = "iD", statistic: str = "euclidean"):
+
+        """
+        Resampling test of the relocation of every protein between two conditions. The movement of a protein is
+        the distance between its mean control profile and its mean treatment profile (over the replicates):
+
+            - "euclidean": plain euclidean distance of the two mean profiles,
+            - "standardized": every fraction difference is divided by its standard error first (replicate
+              variability as in StatProfile.std, plus the median standard error as fudge factor like in SAM),
+              so that noisy fractions count less.
+
+        The null distribution is built by reassigning the replicates to control and treatment, either without
+        (permutation) or with replacement from the pooled replicates (bootstrap). The same reassignment is applied
+        to all proteins at once, so every resample is a few matrix products over the whole proteome.
+
+            test = MovementTest(profiles, control="DMSO", treatment="DIABZI", statistic="standardized")
+            result = test.run(n_resamples=1000, seed=1, n_jobs=-1)
+            result["q_value"]
+
+        Proteins that lack a value in one of the replicates get NaN statistics, p- and q-values.
+
+        Args:
+            profiles (List[Profile]): profiles (list or ProfileSet) of both conditions.
+            control (str): information[condition_key] of the control profiles.
+            treatment (str): information[condition_key] of the treatment profiles.
+            condition_key (str): information key of the condition.
+            replicate_key (str): information key of the replicate.
+            protein_key (str): information key naming the protein of a profile.
+            statistic (str): euclidean (default) or standardized.
+        """
+
+        if statistic not in MovementTest.STATISTICS:
+            raise ProfileError(f"Accepted statistics are {', '.join(MovementTest.STATISTICS)}")
+
+        cube = ImmunoCube.from_profile_set(profiles, (condition_key, replicate_key), protein_key)
+
+        control_conditions = cube.match_conditions(**{condition_key: control})
+        treatment_conditions = cube.match_conditions(**{condition_key: treatment})
+
+        if len(control_conditions) < 2 or len(treatment_conditions) < 2:
+            raise EmptyProfileListError("Control and treatment need at least two replicates each.")
+
+        self.proteins: List[str] = cube.proteins
+        self.fractions: List[str] = cube.fractions
+        self.statistic: str = statistic
+        self.no_control: int = len(control_conditions)
+
+        # (proteins, fractions, replicates): control replicates first, then the treatment replicates
+        self.data: np.ndarray = np.ascontiguousarray(cube.sel(conditions=control_conditions + treatment_conditions).data)
+        self.valid: np.ndarray = ~np.any(np.isnan(self.data), axis=(1, 2))
+
+        assignment = np.arange(self.data.shape[2])[None, :]
+        self.fudge: float = 0.0
+        if statistic == "standardized":
+            self.fudge = float(np.nanmedian(_standard_errors(self.data[self.valid], assignment, self.no_control)))
+
+        self.observed: np.ndarray = np.full(len(self.proteins), np.nan)
+        self.observed[self.valid] = _statistics(self.data[self.valid], assignment, self.no_control, statistic, self.fudge)[:, 0]
+
+    def __repr__(self) -> str:
+        return f"MovementTest(no_proteins={len(self.proteins)}, no_replicates={self.data.shape[2]}, statistic={self.statistic!r})"
+
+    def resamples(self, n_resamples: int, seed: int) -> List[Tuple[np.random.SeedSequence, int]]:
+
+        # one independent child seed per chunk of resamples
+        children = np.random.SeedSequence(seed).spawn(-(-n_resamples // MovementTest.CHUNK_SIZE))
+        sizes = [min(MovementTest.CHUNK_SIZE, n_resamples - position * MovementTest.CHUNK_SIZE) for position in range(len(children))]
+
+        return list(zip(children, sizes))
+
+    def run(self, n_resamples: int = 1000, method: str = "permutation", seed: int = None, n_jobs: int = None,
+            pooled: bool = False) -> Dict[str, np.ndarray]:
+
+        """
+        Draws the null distribution and returns p- and q-values per protein.
+
+        Args:
+            n_resamples (int): number of permutations or bootstrap samples.
+            method (str): permutation (default) or bootstrap.
+            seed (int): seed of the SeedSequence; equal seeds give equal results, independent of n_jobs.
+            n_jobs (int): worker processes. None or 1 runs serially, -1 uses all cores.
+            pooled (bool): compare every protein against the null statistics of all proteins instead of only its
+            own. With few replicates a protein has only a few distinct permutations, pooling gives finer p-values.
+
+        Returns:
+            Dict: "proteins", "statistic" (observed movement), "p_value" and "q_value" (Benjamini-Hochberg).
+        """
+
+        if method not in MovementTest.METHODS:
+            raise ProfileError(f"Accepted methods are {', '.join(MovementTest.METHODS)}")
+
+        data = self.data[self.valid]
+        observed = self.observed[self.valid]
+        tasks = self.resamples(n_resamples, seed)
+        arguments = (data, observed, self.no_control, method, self.statistic, self.fudge, pooled)
+
+        n_jobs = DistanceEngine.number_of_jobs(n_jobs)
+
+        if n_jobs > 1 and len(tasks) > 1:
+            # the data is sent once per worker, the tasks only carry their seed
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_initialize_worker, initargs=arguments) as executor:
+                results = list(executor.map(_run_task, tasks))
+        else:
+            _initialize_worker(*arguments)
+            results = [_run_task(task) for task in tasks]
+
+        p_values = np.full(len(self.proteins), np.nan)
+
+        if pooled:
+            null = np.sort(np.concatenate([result.ravel() for result in results]))
+            exceeding = len(null) - np.searchsorted(null, _lower_bound(observed), side="left")
+            p_values[self.valid] = (1 + exceeding) / (1 + len(null))
+        else:
+            exceeding = np.sum(results, axis=0)
+            p_values[self.valid] = (1 + exceeding) / (1 + n_resamples)
+
+        return {"proteins": list(self.proteins), "statistic": self.observed.copy(), "p_value": p_values,
+                "q_value": MovementTest.benjamini_hochberg(p_values)}
+
+    @staticmethod
+    def benjamini_hochberg(p_values: np.ndarray) -> np.ndarray:
+
+        '''
+        Benjamini-Hochberg adjusted p-values (q-values); NaN p-values are ignored and stay NaN.
+        '''
+
+        p_values = np.asarray(p_values, dtype=np.float64)
+        q_values = np.full(p_values.shape, np.nan)
+
+        finite = np.flatnonzero(~np.isnan(p_values))
+        order = finite[np.argsort(p_values[finite], kind="stable")]
+
+        adjusted = p_values[order] * len(order) / np.arange(1, len(order) + 1)
+        # enforce monotonicity from the largest p-value downwards
+        q_values[order] = np.minimum(np.minimum.accumulate(adjusted[::-1])[::-1], 1.0)
+
+        return q_values
+
+
+def _weights(assignments: np.ndarray, no_replicates: int, no_control: int) -> Tuple[np.ndarray, np.ndarray]:
+
+    # (replicates, resamples) averaging weights of control and treatment; replicates drawn twice count twice
+    no_resamples = assignments.shape[0]
+    control = np.zeros((no_replicates, no_resamples))
+    treatment = np.zeros((no_replicates, no_resamples))
+    columns = np.arange(no_resamples)[:, None]
+
+    np.add.at(control, (assignments[:, :no_control], columns), 1 / no_control)
+    np.add.at(treatment, (assignments[:, no_control:], columns), 1 / (assignments.shape[1] - no_control))
+
+    return control, treatment
+
+
+def _standard_errors(data: np.ndarray, assignments: np.ndarray, no_control: int) -> np.ndarray:
+
+    control, treatment = _weights(assignments, data.shape[2], no_control)
+    no_treatment = assignments.shape[1] - no_control
+
+    # population variances, as StatProfile.std
+    variance_control = np.maximum(data ** 2 @ control - (data @ control) ** 2, 0)
+    variance_treatment = np.maximum(data ** 2 @ treatment - (data @ treatment) ** 2, 0)
+
+    return np.sqrt(variance_control / no_control + variance_treatment / no_treatment)
+
+
+def _statistics(data: np.ndarray, assignments: np.ndarray, no_control: int, statistic: str, fudge: float) -> np.ndarray:
+
+    '''
+    (proteins, resamples) movement statistics for a batch of replicate assignments (resamples, replicates);
+    the first no_control replicates of an assignment form the control group.
+    '''
+
+    control, treatment = _weights(assignments, data.shape[2], no_control)
+    difference = data @ treatment - data @ control  # (proteins, fractions, resamples)
+
+    if statistic == "standardized":
+        difference /= _standard_errors(data, assignments, no_control) + fudge
+
+    return np.sqrt(np.einsum("pfr,pfr->pr", difference, difference))
+
+
+_worker_state: Dict = {}
+
+
+def _initialize_worker(data, observed, no_control, method, statistic, fudge, pooled) -> None:
+
+    # module level so that it can be sent to the worker processes
+    _worker_state.update(data=data, observed=observed, no_control=no_control, method=method, statistic=statistic,
+                         fudge=fudge, pooled=pooled)
+
+
+def _run_task(task: Tuple[np.random.SeedSequence, int]) -> np.ndarray:
+
+    seed, size = task
+    state = _worker_state
+    rng = np.random.default_rng(seed)
+    no_replicates = state["data"].shape[2]
+
+    if state["method"] == "permutation":
+        assignments = rng.permuted(np.tile(np.arange(no_replicates), (size, 1)), axis=1)
+    else:
+        assignments = rng.integers(0, no_replicates, size=(size, no_replicates))
+
+    null = _statistics(state["data"], assignments, state["no_control"], state["statistic"], state["fudge"])
+
+    # pooled tests need the null statistics themselves, per protein tests only the exceedance counts
+    if state["pooled"]:
+        return null
+
+    return np.sum(null >= _lower_bound(state["observed"])[:, None], axis=1)
+
+
+def _lower_bound(observed: np.ndarray) -> np.ndarray:
+
+    # resamples that reproduce the observed grouping differ from it only by rounding and have to count as exceeding
+    return observed - 1e-9 * np.abs(observed)
@@ -0,0 +1,125 @@
+import numpy as np
+from .ProfileSet import ProfileSet
+from .DistanceEngine import DistanceEngine
+from .OptionalDependency import OptionalDependency
+from .ProfileErrors import ProfileError, ProfileNotFoundError, EmptyProfileListError
+from typing import Self, List, Dict, Set, Tuple
+
+
+class NeighbourIndex(object):
+
+    def __init__(self, profiles: List['Profile'], method: str = "euclidean", fractions: List[str] = None, leaf_size: int = 40):
+
+        """
+        Spatial index over a profile collection to answer "which profiles are closest to profile X" without
+        computing a full distance matrix. The index is built once; afterwards every query only visits a few
+        leaves of a KD-tree.
+
+        euclidean and manhattan are indexed directly. pearson is indexed on the standardized profiles (centered,
+        unit length), where the squared euclidean distance equals 2 - 2 * r, and spearman (sorted intensities, as
+        in FractionProfile) on the sorted profiles. The returned values are always in the units of the chosen
+        method, i.e. identical to ProfileManager.get_distance_matrix.
+
+        Args:
+            profiles (List[Profile]): list of profiles or ProfileSet to index.
+            method (str): euclidean (default), manhattan, spearman or pearson.
+            fractions (List[str]): fractions to use. If None, the fractions are taken from the first profile.
+            leaf_size (int): leaf size of the KD-tree.
+        """
+
+        self.method: str = DistanceEngine.check_method(method)
+        self.profile_set: ProfileSet = ProfileSet.objectify_w_profiles(profiles, fractions)
+        self.positions: Dict[str, int] = {iD: position for position, iD in enumerate(self.profile_set.iDs)}
+
+        match self.method:
+            case "euclidean" | "manhattan":
+                points = self.profile_set.data
+            case "pearson":
+                points = DistanceEngine._standardize(self.profile_set.data)
+            case "spearman":
+                points = np.sort(self.profile_set.data, axis=1)
+
+        self.points: np.ndarray = points
+        # scikit-learn is imported on the first index, not with the package
+        neighbors = OptionalDependency.load("sklearn.neighbors")
+        self.tree: 'KDTree' = neighbors.KDTree(points, leaf_size=leaf_size, metric="manhattan" if self.method == "manhattan" else "euclidean")
+
+    def _to_method_units(self, tree_distances: np.ndarray) -> np.ndarray:
+
+        # converts the distances of the tree back into the values of the chosen distance measure
+        match self.method:
+            case "pearson":
+                return 1 - tree_distances ** 2 / 2
+            case "spearman":
+                no_fractions = self.points.shape[1]
+                return tree_distances ** 2 * (6 / (no_fractions * (no_fractions ** 2 - 1)))
+            case _:
+                return tree_distances
+
+    def _prepare_points(self, data: np.ndarray) -> np.ndarray:
+
+        match self.method:
+            case "pearson":
+                return DistanceEngine._standardize(data)
+            case "spearman":
+                return np.sort(data, axis=1)
+            case _:
+                return data
+
+    def position(self, target_iD: str) -> int:
+
+        try:
+            return self.positions[target_iD]
+        except KeyError:
+            raise ProfileNotFoundError(f"Profile {target_iD} is not part of the index.")
+
+    def nearest_neighbours(self, target_iD: str, k: int = 10, include_self: bool = False) -> Tuple[List[str], np.ndarray]:
+
+        '''
+        returns the iDs of the k profiles closest to the target profile along with their distances, closest first.
+        For pearson "closest" means highest correlation.
+        '''
+
+        iDs, distances = self.nearest_neighbours_batch([target_iD], k, include_self)
+
+        return iDs[0], distances[0]
+
+    def nearest_neighbours_batch(self, target_iDs: List[str], k: int = 10, include_self: bool = False) -> Tuple[List[List[str]], np.ndarray]:
+
+        '''
+        nearest_neighbours for many targets at once. Returns one list of iDs per target and a (no_targets, k) distance array.
+        '''
+
+        positions = np.array([self.position(target_iD) for target_iD in target_iDs], dtype=np.int64)
+
+        # ask for one more neighbour so that the target itself can be dropped
+        no_neighbours = min(k if include_self else k + 1, len(self.profile_set))
+        tree_distances, neighbours = self.tree.query(self.points[positions], k=no_neighbours)
+
+        if not include_self:
+            neighbours, tree_distances = NeighbourIndex._drop_targets(neighbours, tree_distances, positions, k)
+
+        return [list(self.profile_set.iDs[row]) for row in neighbours], self._to_method_units(tree_distances)
+
+    @staticmethod
+    def _drop_targets(neighbours: np.ndarray, tree_distances: np.ndarray, positions: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+
+        # remove the target from its own neighbour list; if it is not among them (ties), drop the farthest neighbour
+        is_target = neighbours == positions[:, None]
+        is_target[~is_target.any(axis=1), -1] = True
+
+        keep = ~is_target
+        no_kept = min(k, neighbours.shape[1] - 1)
+
+        return neighbours[keep].reshape(-1, no_kept), tree_distances[keep].reshape(-1, no_kept)
+
+    def query_profiles(self, profiles: List['Profile'], k: int = 10) -> Tuple[List[List[str]], np.ndarray]:
+
+        '''
+        returns the k nearest indexed profiles for profiles that are not part of the index (e.g. another condition).
+        '''
+
+        queries = ProfileSet.objectify_w_profiles(profiles, self.profile_set.fractions)
+        tree_distances, neighbours = self.tree.query(self._prepare_points(queries.data), k=min(k, len(self.profile_set)))
+
+        return [list(self.profile_set.iDs[row]) for row in neighbours], self._to_method_units(tree_distances)
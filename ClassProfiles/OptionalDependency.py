@@ -0,0 +1,35 @@
+import importlib
+from types import ModuleType
+from typing import Self, List, Dict, Set
+
+
+class OptionalDependency(object):
+
+    # top level package -> extra of setup.py that installs it
+    EXTRAS: Dict[str, str] = {"matplotlib": "plot", "seaborn": "plot", "sklearn": "sklearn"}
+
+    @staticmethod
+    def load(module: str) -> ModuleType:
+
+        """
+        Imports a plotting or scikit-learn module on first use instead of at package import, so that jobs which
+        never plot or fit a PCA do not pay for these imports. Repeated calls are dictionary lookups in sys.modules.
+
+            plt = OptionalDependency.load("matplotlib.pyplot")
+
+        Args:
+            module (str): dotted name of the module.
+
+        Returns:
+            ModuleType: the imported module.
+
+        Raises:
+            ImportError: If the module is not installed, naming the extra that provides it.
+        """
+
+        try:
+            return importlib.import_module(module)
+        except ImportError as error:
+            package = module.split(".")[0]
+            raise ImportError(f"{module} is required for this feature, install it with "
+                              f"pip install ImmunoCube[{OptionalDependency.EXTRAS.get(package, 'all')}]") from error
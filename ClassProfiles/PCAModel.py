@@ -0,0 +1,115 @@
+import hashlib
+import numpy as np
+from .ProfileSet import ProfileSet
+from .ProfileErrors import ProfileError, UnequalFractionsError
+from typing import Self, List, Dict, Set
+
+
+class PCAModel(object):
+
+    def __init__(self, fractions: List[str], scaler_mean: np.ndarray, scaler_scale: np.ndarray, mean: np.ndarray, components: np.ndarray,
+                 explained_variance: np.ndarray = None, explained_variance_ratio: np.ndarray = None):
+
+        """
+        Fitted standardization + PCA of a ProfilePCA, detached from the profiles it was fitted on. Scaling and
+        projection are folded into one (no_fractions, no_components) matrix and an offset, so projecting new
+        profiles (e.g. a treatment condition into the space learned on the control) is a single matrix multiply:
+
+            model = ProfilePCA(control_profiles, no_components=6).model
+            model.save("control_pca.npz")
+            treatment_pcs = PCAModel.load("control_pca.npz").transform(treatment_profiles)
+
+        Args:
+            fractions (List[str]): fractions the model was fitted on, in column order.
+            scaler_mean (np.ndarray): per fraction mean of the StandardScaler.
+            scaler_scale (np.ndarray): per fraction scale of the StandardScaler.
+            mean (np.ndarray): mean of the scaled data removed by the PCA.
+            components (np.ndarray): (no_components, no_fractions) principal axes.
+            explained_variance (np.ndarray): variance explained by each component.
+            explained_variance_ratio (np.ndarray): fraction of the variance explained by each component.
+        """
+
+        self.fractions: List[str] = list(fractions)
+        self.scaler_mean: np.ndarray = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale: np.ndarray = np.asarray(scaler_scale, dtype=np.float64)
+        self.mean: np.ndarray = np.asarray(mean, dtype=np.float64)
+        # C order, so that projection and offset are computed the same way after save/load
+        self.components: np.ndarray = np.ascontiguousarray(components, dtype=np.float64)
+        self.explained_variance: np.ndarray = None if explained_variance is None else np.asarray(explained_variance, dtype=np.float64)
+        self.explained_variance_ratio: np.ndarray = None if explained_variance_ratio is None else np.asarray(explained_variance_ratio, dtype=np.float64)
+
+        if self.components.shape[1] != len(self.fractions):
+            raise UnequalFractionsError(f"The components span {self.components.shape[1]} fractions but {len(self.fractions)} fractions were passed.")
+
+        self.PCs: List[str] = [f"PC{i}" for i in range(1, self.components.shape[0] + 1)]
+
+        # ((X - scaler_mean) / scaler_scale - mean) @ components.T == X @ projection + offset
+        self.projection: np.ndarray = (self.components / self.scaler_scale).T
+        self.offset: np.ndarray = -(self.scaler_mean / self.scaler_scale + self.mean) @ self.components.T
+
+    @classmethod
+    def objectify_w_pca(cls, profile_pca: 'ProfilePCA') -> Self:
+
+        if profile_pca.transpose:
+            raise ProfileError("A transposed PCA spans the profiles, not the fractions, and cannot project new profiles.")
+
+        return cls(profile_pca.fractions, profile_pca.scaler.mean_, profile_pca.scaler.scale_, profile_pca.mean, profile_pca.components,
+                   profile_pca.explained_variance, profile_pca.explained_variance_ratio)
+
+    def __repr__(self) -> str:
+        return f"PCAModel(no_fractions={len(self.fractions)}, no_components={len(self.PCs)})"
+
+    @property
+    def fingerprint(self) -> str:
+
+        '''
+        hash of the fitted parameters (not of the derived projection), e.g. to cache results that depend on the
+        model. A model loaded from disk has the same fingerprint as the one that was saved.
+        '''
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update("\x1f".join(self.fractions).encode())
+        for array in (self.scaler_mean, self.scaler_scale, self.mean, self.components):
+            digest.update(repr(array.shape).encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+
+        return digest.hexdigest()
+
+    def transform_array(self, data: np.ndarray) -> np.ndarray:
+
+        '''
+        projects a (no_profiles, no_fractions) array whose columns follow model.fractions.
+        '''
+
+        return np.asarray(data, dtype=np.float64) @ self.projection + self.offset
+
+    def transform(self, profiles: List['Profile']) -> ProfileSet:
+
+        '''
+        projects a profile collection (list or ProfileSet) into the PC space. The result keeps iDs and information,
+        its fractions are PC1 ... PCn. Raises UnequalFractionsError if a profile lacks one of the model fractions.
+        '''
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles, self.fractions)
+
+        return ProfileSet(profile_set.iDs, profile_set.information, self.transform_array(profile_set.data), self.PCs)
+
+    def save(self, path: str) -> None:
+
+        arrays = {"fractions": np.asarray(self.fractions, dtype=np.str_), "scaler_mean": self.scaler_mean,
+                  "scaler_scale": self.scaler_scale, "mean": self.mean, "components": self.components}
+
+        if self.explained_variance is not None:
+            arrays["explained_variance"] = self.explained_variance
+        if self.explained_variance_ratio is not None:
+            arrays["explained_variance_ratio"] = self.explained_variance_ratio
+
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> Self:
+
+        with np.load(path) as arrays:
+            return cls(arrays["fractions"].tolist(), arrays["scaler_mean"], arrays["scaler_scale"], arrays["mean"], arrays["components"],
+                       arrays["explained_variance"] if "explained_variance" in arrays else None,
+                       arrays["explained_variance_ratio"] if "explained_variance_ratio" in arrays else None)
@@ -42,4 +42,8 @@ class EmptyProfileError(ProfileError):
         
 class ComponentErrorPCA(ProfileError):
     def __init__(self, message="Number of components bigger than number of fractions or the number of samples."):
-        super().__init__(message)
\ No newline at end of file
+        super().__init__(message)
+        
+class DuplicateProfileError(ProfileError):
+    def __init__(self, message="Several profiles share the same iD."):
+        super().__init__(message)
@@ -1,20 +1,199 @@
+import csv
+import re
+import numpy as np
+from itertools import chain
+from operator import itemgetter
 from .FractionProfile import FractionProfile
 from .StatProfile import StatProfile
 from .SumProfile import SumProfile
 from .ReferenceProfile import ReferenceProfile
 from .ProfilePCA import ProfilePCA
+from .ProfileSet import ProfileSet
 from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError, ComponentErrorPCA
-from typing import Self, List, Dict, Set
+from typing import Self, List, Dict, Set, Tuple, Iterator
 
 class ProfileFactory(object):
-    
+
     '''
     Sketch of ProfileFactory
     '''
-    
+
     # Reference to ProfileClasses
-    
+
     # def csv pipeline
-    def create_fraction_profiles_with_csv(file: str, profile) -> FractionProfile:
-        # ToDo
-        pass
+    @staticmethod
+    def create_fraction_profiles_with_csv(file: str, column_pattern: str, iD_column: str, information_columns: Dict[str, str] = None,
+                                          delimiter: str = None, chunk_size: int = 10000, encoding: str = "utf-8") -> ProfileSet:
+
+        """
+        Streams a wide table (e.g. MaxQuant proteinGroups.txt or a DIA-NN pg_matrix) into a ProfileSet. Every row
+        of the table holds one protein group, the intensity columns are recognized by a regular expression with
+        named groups: the group "fraction" names the fraction, every other named group (e.g. treatment, replicate)
+        becomes an entry of profile.information. Each row therefore yields one profile per combination of those
+        groups, e.g.
+
+            column_pattern = r"LFQ intensity (?P<fraction>F\\d+)_(?P<treatment>\\w+)_(?P<replicate>\\d+)"
+
+        turns "LFQ intensity F1_DMSO_1", "LFQ intensity F2_DMSO_1", ... into the profile "<PG>_DMSO_1".
+        The table is read chunk_size rows at a time; the intensity columns of a chunk are converted to floats in one
+        array operation and written straight into one intensity buffer, without an intermediate sampleData
+        dictionary. The buffer is grown in place (ndarray.resize), so the table is not held twice in memory.
+        Rows that are shorter than the header (exports often drop trailing empty cells) are padded with empty cells.
+
+        Args:
+            file (str): path of the table.
+            column_pattern (str): regular expression matching the intensity columns (see above).
+            iD_column (str): column holding the protein (group) identifier, stored as information["iD"].
+            information_columns (Dict[str, str]): further columns to store, mapped to their information key,
+            e.g. {"Gene names": "gene", "Potential contaminant": "contaminant"}.
+            delimiter (str): field delimiter. If None, "," for .csv files and tab otherwise.
+            chunk_size (int): number of table rows parsed at once.
+            encoding (str): encoding of the file.
+
+        Returns:
+            ProfileSet: profiles with the iD "<iD_column value>_<group values joined by _>".
+            Empty cells are stored as NaN.
+
+        Raises:
+            ProfileError: If the iD column or an information column is missing or the pattern has no "fraction" group.
+            EmptyProfileListError: If no column matches the pattern or the table has no rows.
+        """
+
+        pattern = re.compile(column_pattern)
+
+        if "fraction" not in pattern.groupindex:
+            raise ProfileError("column_pattern needs a named group called 'fraction'.")
+
+        information_columns = information_columns or {}
+
+        if delimiter is None:
+            delimiter = "," if file.lower().endswith(".csv") else "\t"
+
+        with open(file, newline="", encoding=encoding) as handle:
+
+            reader = csv.reader(handle, delimiter=delimiter)
+            header = next(reader, None)
+
+            if header is None:
+                raise EmptyProfileListError("The table is empty.")
+
+            fractions, groups, column_map = ProfileFactory._map_columns(header, pattern)
+            group_keys = [key for key in pattern.groupindex if key != "fraction"]
+
+            try:
+                iD_position = header.index(iD_column)
+                information_positions = [header.index(column) for column in information_columns]
+            except ValueError as e:
+                raise ProfileError(f"Column missing in {file}: {e}")
+
+            # intensity columns of a row are fetched with a single C-level call
+            intensity_positions = [int(column) for column in column_map.ravel() if column >= 0]
+            fetch = itemgetter(*intensity_positions) if len(intensity_positions) > 1 else lambda row: (row[intensity_positions[0]],)
+
+            # position of every (group, fraction) cell inside the fetched intensity values, -1 for missing columns
+            value_map = np.full(column_map.shape, -1, dtype=np.int64)
+            value_map[column_map >= 0] = np.arange(len(intensity_positions))
+
+            # information shared by all rows of a group and the suffix of the profile iDs
+            group_information = [dict(zip(group_keys, group)) for group in groups]
+            group_suffixes = ["_" + "_".join(group) for group in groups]
+
+            # (profiles, fractions) buffer, the first size rows are filled
+            data = np.empty((0, len(fractions)), dtype=np.float64)
+            size = 0
+            iDs: List[str] = []
+            information: List[Dict[str, str]] = []
+
+            for chunk in ProfileFactory._read_chunks(reader, chunk_size, len(header)):
+
+                flat = list(chain.from_iterable(map(fetch, chunk)))
+                intensities = ProfileFactory._to_float(flat).reshape(len(chunk), -1)
+
+                # grown in place (realloc) by doubling; nothing else references the buffer while it is resized
+                stop = size + len(chunk) * len(groups)
+                if stop > len(data):
+                    data.resize((max(stop, 2 * len(data)), len(fractions)), refcheck=False)
+
+                # (rows, groups, fractions) view of the new rows -> one profile per row and group
+                cube = data[size:stop].reshape((len(chunk),) + value_map.shape)
+                cube[...] = np.nan
+                cube[:, value_map >= 0] = intensities[:, value_map[value_map >= 0]]
+                del cube
+                size = stop
+
+                for row in chunk:
+                    row_iD = row[iD_position]
+                    row_information = {key: row[position] for position, key in zip(information_positions, information_columns.values())}
+                    row_information["iD"] = row_iD
+                    for suffix, shared in zip(group_suffixes, group_information):
+                        iDs.append(row_iD + suffix)
+                        information.append({**row_information, **shared})
+
+        if not size:
+            raise EmptyProfileListError("The table has no rows.")
+
+        # release the spare rows, again without copying
+        data.resize((size, len(fractions)), refcheck=False)
+
+        return ProfileSet(iDs, information, data, fractions)
+
+    @staticmethod
+    def _map_columns(header: List[str], pattern: re.Pattern) -> Tuple[List[str], List[Tuple[str]], np.ndarray]:
+
+        '''
+        returns the fractions, the combinations of the other named groups and a (groups, fractions) array with the
+        header position of every intensity column (-1 if a combination lacks a fraction).
+        '''
+
+        fractions: Dict[str, int] = {}
+        groups: Dict[Tuple[str], int] = {}
+        cells: List[Tuple[int, int, int]] = []
+
+        for position, column in enumerate(header):
+            match = pattern.fullmatch(column)
+            if match is None:
+                continue
+
+            found = match.groupdict()
+            fraction = fractions.setdefault(found.pop("fraction"), len(fractions))
+            group = groups.setdefault(tuple(found.values()), len(groups))
+            cells.append((group, fraction, position))
+
+        if not cells:
+            raise EmptyProfileListError("No column matches column_pattern.")
+
+        column_map = np.full((len(groups), len(fractions)), -1, dtype=np.int64)
+        for group, fraction, position in cells:
+            column_map[group, fraction] = position
+
+        return list(fractions), list(groups), column_map
+
+    @staticmethod
+    def _read_chunks(reader: Iterator[List[str]], chunk_size: int, width: int) -> Iterator[List[List[str]]]:
+
+        chunk: List[List[str]] = []
+
+        for row in reader:
+            # skip blank lines at the end of exports
+            if not row:
+                continue
+            # exports often drop trailing empty cells; pad them so that every column position exists
+            if len(row) < width:
+                row.extend([""] * (width - len(row)))
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _to_float(values: List[str]) -> np.ndarray:
+
+        # numpy parses the strings in one go; empty cells and the usual NA spellings become NaN
+        try:
+            return np.array([value or "nan" for value in values], dtype=np.float64)
+        except ValueError:
+            missing = {"", "NA", "N/A", "NaN", "nan", "Filtered"}
+            return np.array(["nan" if value in missing else value for value in values], dtype=np.float64)
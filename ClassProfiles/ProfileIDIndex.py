@@ -0,0 +1,95 @@
+import numpy as np
+from collections import Counter
+from .ProfileErrors import ProfileError, ProfileNotFoundError, DuplicateProfileError
+from typing import Self, List, Dict, Set
+
+
+class ProfileIDIndex(object):
+
+    def __init__(self, iDs: List[str], check_duplicates: bool = True):
+
+        """
+        Hash index from profile iD to the position of the profile in its collection (list or ProfileSet).
+        Single lookups are O(1), batch lookups and removals return position arrays that can be used to
+        index a ProfileSet or a distance matrix directly.
+
+        Args:
+            iDs (List[str]): iDs of the collection, in order.
+            check_duplicates (bool): raise DuplicateProfileError if an iD occurs more than once. If False, the
+            first occurrence wins, like ProfileManager.retrieve_profile_by_iD.
+        """
+
+        self.size: int = len(iDs)
+
+        # reversed, so that the first occurrence of an iD overwrites later ones
+        self.positions: Dict[str, int] = {iD: position for position, iD in zip(range(self.size - 1, -1, -1), reversed(iDs))}
+
+        if check_duplicates and len(self.positions) != self.size:
+            duplicates = [iD for iD, count in Counter(iDs).items() if count > 1]
+            raise DuplicateProfileError(f"Profile iDs must be unique, found duplicates: {', '.join(map(str, duplicates[:10]))}"
+                                        f"{' ...' if len(duplicates) > 10 else ''}.")
+
+    @classmethod
+    def objectify_w_profiles(cls, profiles: List['Profile'], check_duplicates: bool = True) -> Self:
+        return cls([profile.iD for profile in profiles], check_duplicates)
+
+    def add(self, iDs: List[str]) -> None:
+
+        '''
+        appends iDs of profiles that were added to the end of the collection.
+        '''
+
+        duplicates = [iD for iD in iDs if iD in self.positions]
+
+        if duplicates or len(set(iDs)) != len(iDs):
+            raise DuplicateProfileError(f"Profile iDs must be unique, found duplicates: {', '.join(map(str, duplicates[:10])) or 'within the added profiles'}.")
+
+        self.positions.update(zip(iDs, range(self.size, self.size + len(iDs))))
+        self.size += len(iDs)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, iD: str) -> bool:
+        return iD in self.positions
+
+    def position(self, iD: str) -> int:
+
+        try:
+            return self.positions[iD]
+        except KeyError:
+            raise ProfileNotFoundError(f"Profile {iD} not found.")
+
+    def get_positions(self, iDs: List[str]) -> np.ndarray:
+
+        '''
+        returns the positions of all iDs as an integer array. Raises ProfileNotFoundError listing every missing iD.
+        '''
+
+        positions = self.positions
+        found = np.fromiter((positions.get(iD, -1) for iD in iDs), dtype=np.int64, count=len(iDs))
+
+        if np.any(found < 0):
+            missing = [iD for iD, position in zip(iDs, found) if position < 0]
+            raise ProfileNotFoundError(f"Profile(s) not found: {', '.join(map(str, missing[:10]))}{' ...' if len(missing) > 10 else ''}.")
+
+        return found
+
+    def contains(self, iDs: List[str]) -> np.ndarray:
+
+        '''
+        boolean mask telling which of the iDs are part of the index.
+        '''
+
+        return np.fromiter((iD in self.positions for iD in iDs), dtype=bool, count=len(iDs))
+
+    def remaining_positions(self, iDs: List[str]) -> np.ndarray:
+
+        '''
+        returns the positions that are left after removing the given iDs, in their original order.
+        '''
+
+        keep = np.ones(self.size, dtype=bool)
+        keep[self.get_positions(iDs)] = False
+
+        return np.flatnonzero(keep)
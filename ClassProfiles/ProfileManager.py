@@ -1,18 +1,159 @@
 from deprecated import deprecated
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from typing import Self, List, Dict, Set
-from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError
+from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError, DuplicateProfileError
+from .ProfileSet import ProfileSet
+from .ProfileIDIndex import ProfileIDIndex
+from .InformationIndex import InformationIndex
+from .ProfileQuery import Query
+from .DistanceEngine import DistanceEngine
+from .NeighbourIndex import NeighbourIndex
+from .OptionalDependency import OptionalDependency
+from .DistanceCache import DistanceCache
+from .MovementEngine import MovementEngine
 
 class ProfileManager(object):
     
-    def __init__(self) -> None:
+    def __init__(self, profiles: List['Profile'] = None) -> None:
         
-        # idea: to avoid profiles sharing the same idea raise error -> if len(set([profile.iD for profile in profiles])) != len(profiles)
-        # that line would detect duplicates
+        '''
+        Optionally manages a collection of profiles (list or ProfileSet). An iD -> position index is built once, 
+        which also makes sure that no two profiles share the same iD (raises DuplicateProfileError).
+        The inverted index over profile.information is built on the first search and kept up to date when 
+        profiles are added or removed.
+        '''
+
+        self.profiles: List['Profile'] = profiles
+        self._information_index: InformationIndex = None
+
+        # without profiles the manager starts with an empty index that add_profiles fills
+        if profiles is None:
+            self.iD_index: ProfileIDIndex = ProfileIDIndex([])
+        else:
+            self.iD_index: ProfileIDIndex = ProfileIDIndex([profile.iD for profile in profiles] if not isinstance(profiles, ProfileSet) else list(profiles.iDs))
+
+    @property
+    def information_index(self) -> InformationIndex:
+
+        if self._information_index is None:
+            self._information_index = InformationIndex([profile.information for profile in self.profiles or []]
+                                                       if not isinstance(self.profiles, ProfileSet) else self.profiles.information)
+
+        return self._information_index
+
+    def get_profile(self, profile_iD: str) -> 'Profile':
+
+        '''
+        O(1) lookup of a single profile of the managed collection.
+        '''
+
+        return self.profiles[self.iD_index.position(profile_iD)]
+
+    def get_positions(self, profile_iDs: List[str]) -> np.ndarray:
+
+        '''
+        returns the positions of the profiles in the managed collection (e.g. to select rows of a distance matrix).
+        '''
+
+        return self.iD_index.get_positions(profile_iDs)
+
+    def get_profiles(self, profile_iDs: List[str]) -> List['Profile']:
+
+        '''
+        selects several profiles of the managed collection at once. A ProfileSet returns a ProfileSet.
+        '''
+
+        positions = self.get_positions(profile_iDs)
+
+        if isinstance(self.profiles, ProfileSet):
+            return self.profiles.subset(positions)
+
+        return [self.profiles[position] for position in positions]
+
+    def remove_profiles(self, profile_iDs: List[str]) -> None:
+
+        '''
+        removes profiles from the managed collection and updates the indices.
+        '''
+
+        removed = self.iD_index.get_positions(profile_iDs)
+        positions = self.iD_index.remaining_positions(profile_iDs)
+
+        if isinstance(self.profiles, ProfileSet):
+            self.profiles = self.profiles.subset(positions)
+        else:
+            self.profiles = [self.profiles[position] for position in positions]
+
+        self.iD_index = ProfileIDIndex([profile.iD for profile in self.profiles] if not isinstance(self.profiles, ProfileSet) else list(self.profiles.iDs))
+
+        if self._information_index is not None:
+            self._information_index.remove(removed)
+            self._information_index.compact()
+
+    def add_profiles(self, profiles: List['Profile']) -> None:
+
+        '''
+        appends profiles to the managed collection and updates the indices incrementally.
+        '''
+
+        # materialized once, a generator would be exhausted after the first pass
+        if not isinstance(profiles, ProfileSet):
+            profiles = list(profiles)
+
+        if self.profiles is None:
+            # the first profiles decide whether the collection is kept as ProfileSet or as list
+            merged = profiles
+        elif isinstance(self.profiles, ProfileSet):
+            merged = ProfileSet.concatenate([self.profiles, ProfileSet.objectify_w_profiles(profiles, self.profiles.fractions)])
+        else:
+            merged = self.profiles + profiles
+
+        # the indices are only updated once the new collection could be built; add validates before it changes anything
+        self.iD_index.add(list(profiles.iDs) if isinstance(profiles, ProfileSet) else [profile.iD for profile in profiles])
+        self.profiles = merged
+
+        if self._information_index is not None:
+            for information in (profiles.information if isinstance(profiles, ProfileSet) else [profile.information for profile in profiles]):
+                self._information_index.add(information)
+
+    def retrieve_by_information(self, search_query: Dict[str, str], AND_Operator: bool = True) -> List['Profile']:
+
+        '''
+        like retrieve_by_profile_information, but on the managed collection and its inverted index, so that no
+        index has to be built per call. A ProfileSet returns a ProfileSet.
+        '''
+
+        return ProfileManager._select_by_information(self.profiles, self.information_index, search_query, AND_Operator)
+
+    def query(self, query: Query) -> np.ndarray:
+
+        '''
+        evaluates a query expression (see ProfileQuery) on the managed collection and returns the matching positions, 
+        e.g. manager.query(In("treatment", ["DIABZI", "DMSO"]) & ~Eq("contaminant", "+")).
+        Use get_profiles / ProfileSet.subset to turn the positions into profiles.
+        '''
+
+        return query.positions(self.information_index)
+
+    @staticmethod
+    def _select_by_information(search_list: List['Profile'], index: InformationIndex, search_query: Dict[str, str], AND_Operator: bool):
+
+        conditions = InformationIndex.query_conditions(search_query)
+
+        # every element of a list counts as an own condition, as in the original sequential filtering
+        positions = index.intersection(conditions) if AND_Operator else index.union(conditions)
+
+        # if no profile meets the condition(s), raise an error
+        if len(positions) == 0:
+            raise ProfileNotFoundError
+
+        if isinstance(search_list, ProfileSet):
+            return search_list.subset(positions)
+
+        if AND_Operator:
+            return [search_list[position] for position in positions]
 
-        pass
+        return {search_list[position] for position in positions}
         
     @staticmethod    
     def retrieve_profile_by_iD(profile_list: List['Profile'], profile_iD: str) -> List['Profile']:
@@ -21,6 +162,10 @@ class ProfileManager(object):
         takes a list of profiles as input and returns corresponding profile with matching ID.
         Note, every profile should have a different ID. If two profiles have the same ID it only returns the first profile.
         '''
+
+        # a ProfileSet keeps its own iD index
+        if isinstance(profile_list, ProfileSet):
+            return profile_list.profile(profile_list.iD_index.position(profile_iD))
         
         for profile in profile_list:
             if profile.iD == profile_iD: return profile
@@ -29,19 +174,31 @@ class ProfileManager(object):
     
     @staticmethod    
     def retrieve_profile_by_iDs(profile_list: List['Profile'], profile_iDs: List[str]) -> List['Profile']:
-        return [ProfileManager.retrieve_profile_by_iD(profile_list, profile_iD) for profile_iD in profile_iDs]
+
+        '''
+        takes a list of profiles as input and returns the profiles with matching IDs, in the order of profile_iDs.
+        The list is indexed once, so the cost is O(len(profile_list) + len(profile_iDs)). A ProfileSet returns a ProfileSet.
+        '''
+
+        if isinstance(profile_list, ProfileSet):
+            return profile_list.subset(profile_list.iD_index.get_positions(profile_iDs))
+
+        iD_index = ProfileIDIndex.objectify_w_profiles(profile_list, check_duplicates=False)
+
+        return [profile_list[position] for position in iD_index.get_positions(profile_iDs)]
     
     @staticmethod
     def remove_profile_by_iD(profile_list: List['Profile'], profile_iD: str) -> List['Profile']:
         '''
         deletes profiles by their ID from the input list.
         '''
-        copy_profile_list = profile_list.copy()
+
+        if isinstance(profile_list, ProfileSet):
+            return profile_list.subset(profile_list.iD_index.remaining_positions([profile_iD]))
         
-        for profile in copy_profile_list:
+        for position, profile in enumerate(profile_list):
             if profile.iD == profile_iD:
-                copy_profile_list.remove(profile)
-                return copy_profile_list
+                return profile_list[:position] + profile_list[position + 1:]
             
         raise ProfileNotFoundError # optional, really necessary?
         
@@ -50,6 +207,14 @@ class ProfileManager(object):
         '''
         takes a list of profiles as input and returns a sublist that does not contain the specified IDs.
         '''
+
+        if isinstance(profile_list, ProfileSet):
+            # same exception as for lists when some of the iDs are not part of the collection
+            try:
+                return profile_list.subset(profile_list.iD_index.remaining_positions(list(set(profile_iDs))))
+            except ProfileNotFoundError:
+                raise ValueError("No overlap between the large list and the small list")
+
         sub_set = set(profile_iDs)
         
         # optionallly raise error if not all profiles to delete were in data
@@ -72,6 +237,7 @@ class ProfileManager(object):
         '''
         takes a list of profiles and plots their intensity values for each fraction.
         '''
+        plt = OptionalDependency.load("matplotlib.pyplot")
         plt.figure(figsize=(10, 6))  # Set the figure size
 
         for profile in profile_list:
@@ -92,28 +258,49 @@ class ProfileManager(object):
         plt.show()
     
     @staticmethod
-    def get_distance_matrix(profiles_row_axis: List['Profile'], profiles_column_axis: List['Profile'], distance_method: str = "euclidean") -> np.ndarray:        
+    def get_distance_matrix(profiles_row_axis: List['Profile'], profiles_column_axis: List['Profile'], distance_method: str = "euclidean", symmetric: bool = None,
+                            out_file: str = None, memory_budget: int = 256 * 1024 ** 2, progress = None, n_jobs: int = None,
+                            cache: DistanceCache = None, min_overlap: int = None) -> np.ndarray:        
         
         '''
         Calculates a distance matrix for two lists of profiles. 
         User can specify the distance measurement, default euclidean.
         Returns a distance matrix, along with the column and row labels for downstream plotting/analysis.
+        Both axes can be lists of profiles or ProfileSets; all pairs are computed at once by the DistanceEngine.
+        When the same list is passed for both axes (or symmetric=True) only the upper triangle is computed and a 
+        CondensedDistanceMatrix is returned, which can be indexed like the square matrix or expanded with .square().
+        For matrices that do not fit into memory pass out_file (a .npy path): the matrix is then computed in tiles that 
+        stay within memory_budget (bytes), written to disk and returned memory-mapped. progress(finished_tiles, total_tiles)
+        is called after every tile. Use load_distance_matrix to reopen the file later.
+        n_jobs spreads the rows over several processes (-1: all cores) that share the profile matrix via shared memory.
+        Pass a DistanceCache to return the stored result when the same profiles and distance method are requested again.
+        For profiles with missing values (NaN or dropped fractions) pass min_overlap: every pair is then compared over the 
+        fractions observed in both profiles, and pairs sharing fewer than min_overlap fractions get NaN.
         '''
-        
-        distance_matrix = np.zeros((len(profiles_row_axis), len(profiles_column_axis)))
-        
-        for i, row_profile in enumerate(profiles_row_axis):
-            
-            # Calculate the distance between profile_x and each profile in profiles_y_axis
-            distances = row_profile.calculate_distances(profiles_column_axis, distance_method)
 
-            # Fill the i-th row of the matrix with the calculated distances
-            distance_matrix[i, :] = distances
-            
-        row_labels = [profile.iD for profile in profiles_row_axis]
-        column_labels = [profile.iD for profile in profiles_column_axis]
-        
-        return distance_matrix, row_labels, column_labels 
+        return DistanceEngine.calculate_profile_distances(profiles_row_axis, profiles_column_axis, distance_method, symmetric,
+                                                          out_file, memory_budget, progress, n_jobs, cache, min_overlap)
+
+    @staticmethod
+    def build_neighbour_index(profiles: List['Profile'], distance_method: str = "euclidean") -> NeighbourIndex:
+
+        '''
+        Builds a NeighbourIndex over a list of profiles (or ProfileSet). Use index.nearest_neighbours(target_iD, k) to 
+        retrieve the proteins closest to a protein of interest, or index.nearest_neighbours_batch for many targets, 
+        instead of computing and sorting a full distance matrix.
+        '''
+
+        return NeighbourIndex(profiles, distance_method)
+
+    @staticmethod
+    def load_distance_matrix(path: str):
+
+        '''
+        Opens a distance matrix that was written with get_distance_matrix(..., out_file=path) as memory-mapped array.
+        Returns the matrix along with the row and column labels, like get_distance_matrix.
+        '''
+
+        return DistanceEngine.load_distance_matrix(path)
     
     
     def retrieve_single_query(search_list: List["Profiles"], keyword: str, target_value: str) -> List['Profiles']:
@@ -132,94 +319,53 @@ class ProfileManager(object):
                 return_list.append(profile)
         
         return return_list
+
+    @staticmethod
+    def _information_index(search_list: List['Profile'], search_query: Dict[str, str]) -> InformationIndex:
+
+        # a ProfileSet keeps its inverted index, a plain list is indexed once for the keys of the query
+        if isinstance(search_list, ProfileSet):
+            return search_list.information_index
+
+        return InformationIndex.objectify_w_profiles(search_list, list(search_query))
     
     def AND_operator_retrieve_by_profile_information(search_list: List['Profile'], search_query: Dict[str, str]):
         
         '''
         Performs a search query for multiple conditions for the AND operator. 
         The profiles must meet all requirements to be returned to the user.
+        The conditions are evaluated on an inverted index, starting with the most selective one. Each element of a list 
+        value, e.g. "PG" (Protein Group) = [Protein_A, Protein_B], is a condition of its own.
         '''
-        
-        # iterating through all conditions
-        for keyword, target_value in search_query.items():
-
-            # checks whether query is a list of queries, e.g. "PG" (Proteine Group) = [Protein_A, Protein_B]
-            if isinstance(target_value, list):
-                for value in target_value:
-                    
-                    # return the profiles that met filter criteria
-                    out_list = ProfileManager.retrieve_single_query(search_list, keyword, value)
-
-                    # if no profile meets the condition, raise an error
-                    if not out_list: raise ProfileNotFoundError
 
-                    # update the search list to only include profiles that passed previous filter
-                    search_list = out_list.copy()
-
-            # if query is a single element, e.g. "PG" (Protein Group) = Protein_A
-            else:
-
-                # return the profiles that met filter criteria
-                out_list = ProfileManager.retrieve_single_query(search_list, keyword, target_value)
-                
-                # update the search list to only include profiles that passed previous filter
-                search_list = out_list.copy()
+        index = ProfileManager._information_index(search_list, search_query)
 
-                # if no profile meets the condition, raise an error
-                if not out_list: raise ProfileNotFoundError
-
-                # update the search list to only include profiles that passed previous filter
-                search_list = out_list.copy()
-
-        # return profiles
-        return out_list
+        return ProfileManager._select_by_information(search_list, index, search_query, True)
     
     def OR_operator_retrieve_by_profile_information(search_list: List['Profiles'], search_query: Dict[str, str]) -> Set['Profiles']:
         
         '''
         Performs a search query for multiple conditions for the OR operator. 
         The profiles must meet only one criterion to be returned to the user.
+        The result is the union of the matching postings of an inverted index.
         '''
-        
-        # Initialize an empty set to store profiles that match any condition.
-        # A set is used to ensure uniqueness (no duplicate profiles).
-        out_set: Set['Profile'] = set()
-
-        # Iterate over the search query, where each key-value pair represents
-        # a search criterion (keyword: target_value).
-        for keyword, target_value in search_query.items():
-
-            # If the target_value is a list, we need to check for any match
-            # within that list. This allows multiple possible matches for a keyword.
-            if isinstance(target_value, list):
-                for value in target_value:
-
-                    # Iterate over each profile in the search_list.
-                    for profile in search_list:
-
-                        # If the profile's information matches the current keyword and value,
-                        # add it to the set. Using 'value' here instead of 'target_value'
-                        # to check each value in the list.
-                        if profile.information[keyword] == value:
-                            out_set.add(profile)
-
-            # If the target_value is not a list (i.e., it's a single value),
-            # iterate through the search_list and check for matches.
-            else:
-                for profile in search_list:
 
-                    # If the profile's information matches the current keyword and target_value,
-                    # add it to the set.
-                    if profile.information[keyword] == target_value:
-                        out_set.add(profile)
+        index = ProfileManager._information_index(search_list, search_query)
 
-        # If no profiles were added to the set, raise a ProfileNotFoundError.
-        if not out_set:
-            raise ProfileNotFoundError
-        # Otherwise, return the set of profiles that matched any of the conditions.
-        else:
-            return out_set          
+        return ProfileManager._select_by_information(search_list, index, search_query, False)
                 
+    @staticmethod
+    def query_positions(profiles_list: List['Profile'], query: Query) -> np.ndarray:
+
+        '''
+        evaluates a query expression on a list of profiles or ProfileSet in one pass and returns the positions of the
+        matching profiles, instead of chaining several retrieve_by_profile_information calls.
+        '''
+
+        index = profiles_list.information_index if isinstance(profiles_list, ProfileSet) else InformationIndex.objectify_w_profiles(profiles_list)
+
+        return query.positions(index)
+
     @staticmethod                
     def retrieve_by_profile_information(profiles_list: List['Profile'], search_query: Dict[str, str], AND_Operator = True) -> List['Profile']:
         
@@ -230,8 +376,8 @@ class ProfileManager(object):
         '''
         try:
             
-            # initialize search list
-            search_list: List['Profile'] = profiles_list.copy()
+            # initialize search list (the search does not modify it, no copy needed)
+            search_list: List['Profile'] = profiles_list
             
             # if the profile must meet all query conditions
             if AND_Operator:
@@ -241,7 +387,7 @@ class ProfileManager(object):
             else:
                 return ProfileManager.OR_operator_retrieve_by_profile_information(search_list, search_query)
     
-        except KeyError:
+        except KeyError as keyword:
             print(f"Not a valid key. {keyword} was most likely not accounted for in the experiment")
     
     @deprecated
@@ -252,6 +398,9 @@ class ProfileManager(object):
         Function that takes a distance matrix as input and plots it as heatmap. 
         '''
         
+        plt = OptionalDependency.load("matplotlib.pyplot")
+        sns = OptionalDependency.load("seaborn")
+
         plt.figure(figsize=(8, 6))  # Set the figure size
         sns.heatmap(matrix, cmap='coolwarm', linewidths=0.5, 
                     xticklabels=column_labels, yticklabels=row_labels)
@@ -277,31 +426,41 @@ class ProfileManager(object):
         in order to get the movement within the cells/compartments. Next, the row or column, depending on the value of 
         the return_val argument, of the target/protein of interest is selected and returned to the user along with the 
         labels for subsequent plotting.        
+        Only the selected row/column is read from the matrices, so memory-mapped matrices are never loaded as a whole.
         '''
-    
-        movements = matrix2 - matrix1  
 
         if return_val == "row":
 
             index = row_labels.index(target_of_interest)
-            movement_row = movements[index]
-            matrix1_row = matrix1[index]
-            matrix2_row = matrix2[index]
+            matrix1_row = np.asarray(matrix1[index])
+            matrix2_row = np.asarray(matrix2[index])
+            movement_row = matrix2_row - matrix1_row
 
             return movement_row, matrix1_row, matrix2_row, col_labels, target_of_interest
 
         elif return_val == "col" or return_val == "column":
 
             index = col_labels.index(target_of_interest)
-            movement_col = movements[:, index]
-            matrix1_col = matrix1[:, index]
-            matrix2_col = matrix2[:, index]
+            matrix1_col = np.asarray(matrix1[:, index])
+            matrix2_col = np.asarray(matrix2[:, index])
+            movement_col = matrix2_col - matrix1_col
 
             return movement_col, matrix1_col, matrix2_col, row_labels, target_of_interest
 
         else:
             ValueError("accepted arguments are row, col or column")
     
+    @staticmethod
+    def get_movement_engine(matrix1, matrix2, row_labels, col_labels) -> MovementEngine:
+
+        '''
+        Computes the movement matrix2 - matrix1 once and returns a MovementEngine, which looks targets up by label
+        and ranks all proteins (net movement, top-k gained/lost neighbours) in one call, instead of calling
+        get_movement once per protein.
+        '''
+
+        return MovementEngine(matrix1, matrix2, row_labels, col_labels)
+
     @deprecated
     @staticmethod
     def plot_movement(movement_row, row_treatment, row_untreated, y_labels, x_label):
@@ -310,6 +469,8 @@ class ProfileManager(object):
         Plots the movement row of a target protein together with distance measurements for control and treatment.
         '''
         
+        plt = OptionalDependency.load("matplotlib.pyplot")
+
         n_groups = len(y_labels)
 
         # Set the positions of the groups (reversed for horizontal plot)
@@ -1,17 +1,21 @@
 from .FractionProfile import FractionProfile
 from .StatProfile import StatProfile
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
+from .ProfileSet import ProfileSet
+from .PCAModel import PCAModel
+from .OptionalDependency import OptionalDependency
+import numpy as np
 from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError, ComponentErrorPCA
 from typing import Self, List, Dict, Set
 import math
 from deprecated import deprecated
-import matplotlib.pyplot as plt
 
 
 class ProfilePCA(FractionProfile):
 
-    def __init__(self, profiles: List['Profile'], transpose: bool = False, no_components: int = 6, fractions: List[str] = None, PCA_iD: str = None, PCA_information: Dict[str,str] = None):
+    SOLVERS: List[str] = ["full", "randomized", "incremental"]
+
+    def __init__(self, profiles: List['Profile'], transpose: bool = False, no_components: int = 6, fractions: List[str] = None, PCA_iD: str = None, PCA_information: Dict[str,str] = None,
+                 solver: str = "full", batch_size: int = 10000, random_state: int = None):
         
         """
         Initializes a ProfilePCA object, performing dimensionality reduction on a list of profiles.
@@ -28,9 +32,16 @@ class ProfilePCA(FractionProfile):
             fractions (List[str]): List of fractions. If None, the fractions are taken from the first profile.
             PCA_iD (str): Optional ID for the PCA object.
             PCA_information (Dict[str, str]): Optional information dictionary for the PCA object.
+            solver (str): "full" (default) runs the exact PCA on the whole matrix. "randomized" uses the randomized
+            SVD, which is much faster for large inputs when only a few components are needed. "incremental" streams
+            the profiles in batches of batch_size through StandardScaler.partial_fit and IncrementalPCA, so only one
+            batch is held as array at a time (not available with transpose).
+            batch_size (int): number of profiles per batch of the incremental solver.
+            random_state (int): seed of the randomized solver.
 
         Raises:
             ComponentErrorPCA: If the number of components exceeds the number of fractions or samples.
+            ProfileError: If the solver is unknown or the incremental solver is combined with transpose.
         """
         
         # storing the profiles 
@@ -38,6 +49,14 @@ class ProfilePCA(FractionProfile):
         self.no_profiles = len(profiles)
         self.no_components = no_components  
         self.transpose = transpose 
+        self.solver = solver
+        self.batch_size = batch_size
+        self.random_state = random_state
+        
+        if solver not in ProfilePCA.SOLVERS:
+            raise ProfileError(f"Accepted solvers are {', '.join(ProfilePCA.SOLVERS)}")
+        if solver == "incremental" and transpose:
+            raise ProfileError("The incremental solver streams profiles and cannot be combined with transpose.")
         
         if fractions == None: 
             # if no fractions are specified the first profile in the list provides the default fractions
@@ -78,17 +97,26 @@ class ProfilePCA(FractionProfile):
             np.array: Transformed data after PCA.
         """
     
-        # perform PCA
-        pca = PCA(no_components)
-        self.scaler = StandardScaler()
+        if self.solver == "incremental":
+            pca, data_pca = self._calculate_incremental_pca(no_components, profiles)
         
-        data_samples: List[List[float]] = [list(profile.sampleData.values()) for profile in profiles]
-        scaled_data = self.scaler.fit_transform(data_samples)    
-        
-        if self.transpose:
-            data_pca = pca.fit_transform(scaled_data.T)
         else:
-            data_pca = pca.fit_transform(scaled_data)
+            # scikit-learn is imported on the first PCA, not with the package
+            decomposition = OptionalDependency.load("sklearn.decomposition")
+            preprocessing = OptionalDependency.load("sklearn.preprocessing")
+            
+            # perform PCA
+            pca = decomposition.PCA(no_components, svd_solver=self.solver, random_state=self.random_state if self.solver == "randomized" else None)
+            self.scaler = preprocessing.StandardScaler()
+            
+            # one contiguous (no_profiles, no_fractions) array aligned on self.fractions instead of a list of lists
+            data_samples: 'np.array' = ProfileSet.objectify_w_profiles(profiles, self.fractions).data
+            scaled_data = self.scaler.fit_transform(data_samples)    
+            
+            if self.transpose:
+                data_pca = pca.fit_transform(scaled_data.T)
+            else:
+                data_pca = pca.fit_transform(scaled_data)
         
         # accessing PCA attributes
         self.explained_variance = pca.explained_variance_
@@ -100,6 +128,55 @@ class ProfilePCA(FractionProfile):
                 
         return data_pca
 
+    def _batches(self, profiles) -> 'Iterator[np.array]':
+        
+        # batches of at least no_components profiles (IncrementalPCA needs that many samples per partial_fit);
+        # a short remainder is added to the previous batch
+        batch_size = max(self.batch_size, self.no_components)
+        bounds = list(range(0, self.no_profiles, batch_size)) + [self.no_profiles]
+        if len(bounds) > 2 and bounds[-1] - bounds[-2] < self.no_components:
+            del bounds[-2]
+        
+        for start, stop in zip(bounds, bounds[1:]):
+            # slices of a ProfileSet are views, slices of a list are converted batch by batch
+            yield ProfileSet.objectify_w_profiles(profiles[start:stop], self.fractions).data
+        
+    def _calculate_incremental_pca(self, no_components: int, profiles) -> 'Tuple[IncrementalPCA, np.array]':
+        
+        """
+        Fits scaler and PCA in three streamed passes over the profiles (scaler, PCA, projection), each holding
+        one batch of batch_size profiles at a time.
+        """
+        
+        decomposition = OptionalDependency.load("sklearn.decomposition")
+        preprocessing = OptionalDependency.load("sklearn.preprocessing")
+        
+        self.scaler = preprocessing.StandardScaler()
+        for batch in self._batches(profiles):
+            self.scaler.partial_fit(batch)
+        
+        pca = decomposition.IncrementalPCA(no_components)
+        for batch in self._batches(profiles):
+            pca.partial_fit(self.scaler.transform(batch))
+        
+        data_pca = np.empty((self.no_profiles, no_components))
+        position = 0
+        for batch in self._batches(profiles):
+            data_pca[position:position + len(batch)] = pca.transform(self.scaler.transform(batch))
+            position += len(batch)
+        
+        return pca, data_pca
+
+    @property
+    def model(self) -> PCAModel:
+        
+        '''
+        fitted scaler + components as PCAModel, to project further profile collections (e.g. other conditions) into
+        the PC space of this PCA without refitting, or to save it with model.save(path).
+        '''
+        
+        return PCAModel.objectify_w_pca(self)
+
     @classmethod
     def objectify_w_profile(cls, profile: 'Profile', deep_copy: bool = False) -> Self: 
         raise ProfileError("It does not make sense to create a PCA out of a single Profile.")
@@ -151,6 +228,8 @@ class ProfilePCA(FractionProfile):
     @deprecated
     def plotter(self, max_samples_to_plot=None):
         
+        plt = OptionalDependency.load("matplotlib.pyplot")
+
         # Plotting each row of the data as a separate line
         plt.figure(figsize=(10, 6))  # Set the figure size
         
@@ -0,0 +1,248 @@
+import copy
+import hashlib
+import math
+import numpy as np
+from .ProfileSet import ProfileSet
+from .DistanceEngine import DistanceEngine
+from .PCAModel import PCAModel
+from .FractionProfile import FractionProfile
+from .SumProfile import SumProfile
+from .ReferenceProfile import ReferenceProfile
+from .ProfilePCA import ProfilePCA
+from .ProfileErrors import ProfileError, UnequalFractionsError, FractionZeroDivisionError, ComponentErrorPCA
+from typing import Self, List, Dict, Set, Tuple
+
+
+class ProfilePipeline(object):
+
+    # stages that only rescale the intensities of each profile; consecutive ones are fused into a single pass
+    ELEMENTWISE: Tuple[str] = ("sum", "reference")
+
+    def __init__(self, profiles: List['Profile'], fractions: List[str] = None, cache: Dict = None):
+
+        """
+        Declarative chain of transformations on a profile collection. Calling a stage method only records the
+        stage and returns a new pipeline; nothing is computed until run(). When running,
+
+            - consecutive normalization stages are fused: the intensities are copied once and every stage works
+              in place on that buffer, instead of building a new list of profile objects per stage,
+            - the result of every stage group is cached under a fingerprint of the input data and all stages up to
+              it, so a pipeline that shares its beginning with one that already ran starts from the cached result.
+
+        Pipelines derived from each other share the cache, e.g. changing only the distance metric skips the
+        normalization and the PCA:
+
+            base = ProfilePipeline(profiles).normalize_sum().normalize_reference(control, base=2).pca(6)
+            euclidean = base.distance("euclidean").run()
+            pearson = base.distance("pearson").run()
+
+        Profiles that cannot be normalized become NaN rows; the PCA is fitted on the remaining rows and distances
+        to NaN rows are NaN.
+
+        Args:
+            profiles (List[Profile]): profiles (list or ProfileSet) the pipeline starts from.
+            fractions (List[str]): fractions to use. If None the first profile provides the fractions.
+            cache (Dict): fingerprint -> result store. Pass the same dictionary to pipelines built on the same
+            profiles to share results between them.
+        """
+
+        self.profiles: ProfileSet = ProfileSet.objectify_w_profiles(profiles, fractions)
+        self.cache: Dict[str, object] = {} if cache is None else cache
+        self.stages: List[Tuple[str, Dict, str]] = []  # (name, parameters, fingerprint)
+
+        # the intensities, iDs and fractions identify the input
+        source = hashlib.blake2b(digest_size=16)
+        source.update(np.ascontiguousarray(self.profiles.data).tobytes())
+        source.update("\x1f".join(map(str, self.profiles.iDs)).encode())
+        source.update("\x1f".join(self.profiles.fractions).encode())
+        self.source: str = source.hexdigest()
+
+    def __repr__(self) -> str:
+        return f"ProfilePipeline({' -> '.join(name for name, _, _ in self.stages) or 'input'})"
+
+    @property
+    def fingerprint(self) -> str:
+        return self.stages[-1][2] if self.stages else self.source
+
+    def _extend(self, name: str, parameters: Dict, token: bytes) -> Self:
+
+        if self.stages and self.stages[-1][0] == "distance":
+            raise ProfileError("distance has to be the last stage of a pipeline.")
+
+        fingerprint = hashlib.blake2b(self.fingerprint.encode() + name.encode() + token, digest_size=16).hexdigest()
+
+        pipeline = copy.copy(self)
+        pipeline.stages = self.stages + [(name, parameters, fingerprint)]
+
+        return pipeline
+
+    def normalize_sum(self) -> Self:
+
+        '''
+        records a sum normalization (as SumProfile).
+        '''
+
+        return self._extend("sum", {}, b"")
+
+    def normalize_reference(self, reference_profile: 'Profile', base: float = math.e) -> Self:
+
+        '''
+        records a log-ratio against a reference profile (as ReferenceProfile) with the given log base.
+        '''
+
+        values = [reference_profile.sampleData[fraction] for fraction in reference_profile.sampleData]
+        token = repr((list(reference_profile.sampleData), values, base)).encode()
+
+        return self._extend("reference", {"reference": dict(zip(reference_profile.sampleData, values)), "base": base}, token)
+
+    def pca(self, no_components: int = 6, solver: str = "full", batch_size: int = 10000, random_state: int = None) -> Self:
+
+        '''
+        records a standardization followed by a PCA (ProfilePCA, with its solvers); the fractions of the result are
+        PC1 ... PCn. The fitted model is available through fitted_model(), e.g. to project() other conditions.
+        '''
+
+        parameters = {"no_components": no_components, "solver": solver, "batch_size": batch_size, "random_state": random_state}
+
+        return self._extend("pca", parameters, repr(sorted(parameters.items())).encode())
+
+    def project(self, model: PCAModel) -> Self:
+
+        '''
+        records the projection into the PC space of an already fitted PCAModel (e.g. ProfilePCA(control).model),
+        so that conditions are compared in the same space. Unlike pca nothing is fitted.
+        '''
+
+        return self._extend("project", {"model": model}, model.fingerprint.encode())
+
+    def distance(self, method: str = "euclidean", n_jobs: int = None) -> Self:
+
+        '''
+        records the distance matrix of all profiles against each other as last stage. n_jobs does not change the
+        result and is not part of the fingerprint.
+        '''
+
+        method = DistanceEngine.check_method(method)
+
+        return self._extend("distance", {"method": method, "n_jobs": n_jobs}, method.encode())
+
+    def _groups(self, start: int) -> List[List[Tuple[str, Dict, str]]]:
+
+        # consecutive elementwise stages form one group, every other stage is a group of its own
+        groups: List[List[Tuple[str, Dict, str]]] = []
+
+        for stage in self.stages[start:]:
+            if groups and stage[0] in ProfilePipeline.ELEMENTWISE and groups[-1][-1][0] in ProfilePipeline.ELEMENTWISE:
+                groups[-1].append(stage)
+            else:
+                groups.append([stage])
+
+        return groups
+
+    def run(self):
+
+        '''
+        executes the pipeline, starting after the last stage that is already cached.
+
+        Returns:
+            ProfileSet for pipelines ending in a transformation, or (distance matrix, row labels, column labels)
+            like ProfileManager.get_distance_matrix for pipelines ending in distance.
+        '''
+
+        start = len(self.stages)
+        while start > 0 and self.stages[start - 1][2] not in self.cache:
+            start -= 1
+
+        result = self.cache[self.stages[start - 1][2]] if start > 0 else self.profiles
+
+        for group in self._groups(start):
+            name = group[0][0]
+
+            if name in ProfilePipeline.ELEMENTWISE:
+                result = ProfilePipeline._run_elementwise(result, group)
+            elif name == "pca":
+                result, self.cache[group[0][2] + "|model"] = ProfilePipeline._run_pca(result, **group[0][1])
+            elif name == "project":
+                result = ProfilePipeline._run_project(result, **group[0][1])
+            else:
+                result = ProfilePipeline._run_distance(result, **group[0][1])
+
+            self.cache[group[-1][2]] = result
+
+        return result
+
+    def fitted_model(self) -> PCAModel:
+
+        '''
+        PCAModel fitted by the last pca stage of the pipeline, running the pipeline up to that stage if it is not
+        cached yet. Use it to project other conditions into the same space: other.project(base.fitted_model()).
+        '''
+
+        positions = [position for position, (name, _, _) in enumerate(self.stages) if name == "pca"]
+
+        if not positions:
+            raise ProfileError("The pipeline has no pca stage.")
+
+        key = self.stages[positions[-1]][2] + "|model"
+
+        if key not in self.cache:
+            prefix = copy.copy(self)
+            prefix.stages = self.stages[:positions[-1] + 1]
+            prefix.run()
+
+        return self.cache[key]
+
+    @staticmethod
+    def _run_elementwise(profile_set: ProfileSet, stages: List[Tuple[str, Dict, str]]) -> ProfileSet:
+
+        # a single copy of the intensities, every normalization of the group then works in place on it
+        working = ProfileSet(profile_set.iDs, profile_set.information, profile_set.data.copy(), profile_set.fractions)
+
+        for name, parameters, _ in stages:
+            if name == "sum":
+                SumProfile.normalize_profile_set(working, in_place=True)
+            else:
+                reference_profile = FractionProfile(None, None, parameters["reference"])
+                ReferenceProfile.normalize_profile_set(working, reference_profile, parameters["base"], in_place=True)
+
+        return working
+
+    @staticmethod
+    def _run_pca(profile_set: ProfileSet, no_components: int, solver: str = "full", batch_size: int = 10000,
+                 random_state: int = None) -> Tuple[ProfileSet, PCAModel]:
+
+        # fitted on the valid rows only, invalid rows stay NaN
+        valid = np.all(np.isfinite(profile_set.data), axis=1)
+        profile_pca = ProfilePCA(profile_set.subset(valid), no_components=no_components, fractions=profile_set.fractions,
+                                 solver=solver, batch_size=batch_size, random_state=random_state)
+
+        data = np.full((len(profile_set), no_components), np.nan)
+        data[valid] = profile_pca.data_pca
+
+        return ProfileSet(profile_set.iDs, profile_set.information, data, profile_pca.PCs), profile_pca.model
+
+    @staticmethod
+    def _run_project(profile_set: ProfileSet, model: PCAModel) -> ProfileSet:
+
+        if sorted(model.fractions) != sorted(profile_set.fractions):
+            raise UnequalFractionsError
+
+        # NaN rows stay NaN rows
+        data = profile_set.data[:, [profile_set.fraction_index[fraction] for fraction in model.fractions]]
+
+        return ProfileSet(profile_set.iDs, profile_set.information, model.transform_array(data), model.PCs)
+
+    @staticmethod
+    def _run_distance(profile_set: ProfileSet, method: str, n_jobs: int = None) -> Tuple[np.ndarray, List[str], List[str]]:
+
+        labels = list(profile_set.iDs)
+        valid = np.all(np.isfinite(profile_set.data), axis=1)
+
+        if np.all(valid):
+            return DistanceEngine.calculate_distance_matrix(profile_set.data, profile_set.data, method, n_jobs), labels, labels
+
+        distance_matrix = np.full((len(profile_set), len(profile_set)), np.nan)
+        data = profile_set.data[valid]
+        distance_matrix[np.ix_(valid, valid)] = DistanceEngine.calculate_distance_matrix(data, data, method, n_jobs)
+
+        return distance_matrix, labels, labels
@@ -0,0 +1,176 @@
+import numpy as np
+from abc import ABC, abstractmethod
+from .InformationIndex import InformationIndex
+from .ProfileErrors import ProfileError
+from typing import Self, List, Dict, Set, Hashable
+
+
+def _without(candidates: np.ndarray, hits: np.ndarray) -> np.ndarray:
+
+    # hits are a sorted subset of the sorted candidates, so their places can be found with a binary search
+    keep = np.ones(len(candidates), dtype=bool)
+    keep[np.searchsorted(candidates, hits)] = False
+
+    return candidates[keep]
+
+
+class Query(ABC):
+
+    '''
+    Base class of the query expressions on profile.information. Expressions are only recorded when they are
+    combined with & (and), | (or) and ~ (not); nothing is evaluated until positions() is called, e.g.
+
+        query = (In("treatment", ["DIABZI", "DMSO"]) & In("replicate", ["1", "2", "3"])) & ~Eq("contaminant", "+")
+        positions = query.positions(index)
+
+    While evaluating, the children of an And are run from the most to the least selective one (estimated from
+    the posting sizes of the index) and every child only looks at the survivors of the previous one.
+    '''
+
+    def __and__(self, other: 'Query') -> 'And':
+        return And(self, other)
+
+    def __or__(self, other: 'Query') -> 'Or':
+        return Or(self, other)
+
+    def __invert__(self) -> 'Not':
+        return Not(self)
+
+    @abstractmethod
+    def estimate(self, index: InformationIndex) -> int:
+
+        '''
+        upper bound of the number of matching profiles, used to order the evaluation.
+        '''
+
+    @abstractmethod
+    def evaluate(self, index: InformationIndex, candidates: np.ndarray = None) -> np.ndarray:
+
+        '''
+        returns the sorted positions (out of candidates, or out of all profiles if candidates is None) that match.
+        '''
+
+    def positions(self, index: InformationIndex) -> np.ndarray:
+        return self.evaluate(index)
+
+
+class Eq(Query):
+
+    def __init__(self, key: str, value: Hashable):
+        self.key: str = key
+        self.value: Hashable = value
+
+    def __repr__(self) -> str:
+        return f"Eq({self.key!r}, {self.value!r})"
+
+    def estimate(self, index: InformationIndex) -> int:
+        return index.count(self.key, self.value)
+
+    def evaluate(self, index: InformationIndex, candidates: np.ndarray = None) -> np.ndarray:
+
+        if candidates is None:
+            # the posting is a view into the index, callers get their own array
+            return index.posting(self.key, self.value).copy()
+
+        return index.filter(candidates, self.key, [self.value])
+
+
+class In(Query):
+
+    def __init__(self, key: str, values: List[Hashable]):
+        self.key: str = key
+        self.values: List[Hashable] = list(values)
+
+    def __repr__(self) -> str:
+        return f"In({self.key!r}, {self.values!r})"
+
+    def estimate(self, index: InformationIndex) -> int:
+        return sum(index.count(self.key, value) for value in set(self.values))
+
+    def evaluate(self, index: InformationIndex, candidates: np.ndarray = None) -> np.ndarray:
+
+        if candidates is None:
+            return index.union([(self.key, value) for value in set(self.values)])
+
+        return index.filter(candidates, self.key, self.values)
+
+
+class Not(Query):
+
+    def __init__(self, query: Query):
+        self.query: Query = query
+
+    def __repr__(self) -> str:
+        return f"Not({self.query!r})"
+
+    def estimate(self, index: InformationIndex) -> int:
+        return len(index)
+
+    def evaluate(self, index: InformationIndex, candidates: np.ndarray = None) -> np.ndarray:
+
+        if candidates is None:
+            candidates = np.flatnonzero(index.alive)
+
+        return _without(candidates, self.query.evaluate(index, candidates))
+
+
+class And(Query):
+
+    def __init__(self, *queries: Query):
+
+        if not queries:
+            raise ProfileError("And needs at least one query.")
+
+        # flatten nested Ands, so that all of their children are ordered together
+        self.queries: List[Query] = [child for query in queries for child in (query.queries if isinstance(query, And) else [query])]
+
+    def __repr__(self) -> str:
+        return f"And({', '.join(map(repr, self.queries))})"
+
+    def estimate(self, index: InformationIndex) -> int:
+        return min(query.estimate(index) for query in self.queries)
+
+    def evaluate(self, index: InformationIndex, candidates: np.ndarray = None) -> np.ndarray:
+
+        # most selective child first, each following child only filters the survivors
+        for query in sorted(self.queries, key=lambda query: query.estimate(index)):
+            candidates = query.evaluate(index, candidates)
+
+            if len(candidates) == 0:
+                break
+
+        return candidates
+
+
+class Or(Query):
+
+    def __init__(self, *queries: Query):
+
+        if not queries:
+            raise ProfileError("Or needs at least one query.")
+
+        self.queries: List[Query] = [child for query in queries for child in (query.queries if isinstance(query, Or) else [query])]
+
+    def __repr__(self) -> str:
+        return f"Or({', '.join(map(repr, self.queries))})"
+
+    def estimate(self, index: InformationIndex) -> int:
+        return min(len(index), sum(query.estimate(index) for query in self.queries))
+
+    def evaluate(self, index: InformationIndex, candidates: np.ndarray = None) -> np.ndarray:
+
+        if candidates is None:
+            return np.unique(np.concatenate([query.evaluate(index) for query in self.queries]))
+
+        # least selective child first, the following children only look at candidates that did not match yet
+        matched: List[np.ndarray] = []
+
+        for query in sorted(self.queries, key=lambda query: query.estimate(index), reverse=True):
+            hits = query.evaluate(index, candidates)
+            matched.append(hits)
+            candidates = _without(candidates, hits)
+
+            if len(candidates) == 0:
+                break
+
+        return np.sort(np.concatenate(matched))
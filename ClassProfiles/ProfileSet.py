@@ -0,0 +1,264 @@
+import numpy as np
+from collections.abc import MutableMapping
+from .FractionProfile import FractionProfile
+from .ProfileIDIndex import ProfileIDIndex
+from .InformationIndex import InformationIndex
+from .ProfileErrors import ProfileError, UnequalFractionsError, EmptyProfileListError, ProfileNotFoundError
+from typing import Self, List, Dict, Set, Iterator
+
+
+class SampleDataView(MutableMapping):
+
+    """
+    Dictionary-like view of a single row of a ProfileSet. Reading and writing go straight to the
+    underlying array, so a FractionProfile handed out by a ProfileSet does not own a copy of its data.
+    """
+
+    __slots__ = ("_fraction_index", "_row")
+
+    def __init__(self, fraction_index: Dict[str, int], row: np.ndarray):
+
+        self._fraction_index: Dict[str, int] = fraction_index  # shared between all rows of the ProfileSet
+        self._row: np.ndarray = row  # 1-D view into ProfileSet.data
+
+    def __getitem__(self, fraction: str) -> float:
+        return float(self._row[self._fraction_index[fraction]])
+
+    def __setitem__(self, fraction: str, value: float) -> None:
+        self._row[self._fraction_index[fraction]] = value
+
+    def __delitem__(self, fraction: str) -> None:
+        raise ProfileError("Fractions of a ProfileSet are shared across all profiles and cannot be removed from a single profile.")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fraction_index)
+
+    def __len__(self) -> int:
+        return len(self._fraction_index)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ProfileSet(object):
+
+    def __init__(self, iDs: List[str], information: List[Dict[str, str]], data: np.ndarray, fractions: List[str]):
+
+        """
+        Columnar collection of profiles. All intensities are stored in one contiguous 2-D float array
+        with the dimensions (no_profiles, no_fractions) that shares a single fraction axis.
+
+        Args:
+            iDs (List[str]): iD of every profile, in row order.
+            information (List[Dict[str, str]]): metadata table, one information dictionary per row.
+            data (np.ndarray): intensity matrix with the dimensions (no_profiles, no_fractions).
+            fractions (List[str]): fraction labels of the columns of data.
+
+        Raises:
+            UnequalFractionsError: If the number of columns does not match the number of fractions.
+            ProfileError: If iDs, information and rows of data do not have the same length.
+        """
+
+        self.data: np.ndarray = np.ascontiguousarray(data, dtype=np.float64)
+
+        if self.data.ndim != 2:
+            raise ProfileError(f"ProfileSet data has to be 2-D (profiles x fractions), got {self.data.ndim} dimension(s).")
+
+        self.fractions: List[str] = list(fractions)
+        self.fraction_index: Dict[str, int] = {fraction: index for index, fraction in enumerate(self.fractions)}
+
+        if self.data.shape[1] != len(self.fractions):
+            raise UnequalFractionsError(f"Data has {self.data.shape[1]} columns but {len(self.fractions)} fractions were passed.")
+
+        # object array so that fancy indexing works the same way as for the data matrix
+        self.iDs: np.ndarray = np.asarray(iDs, dtype=object)
+        self.information: List[Dict[str, str]] = list(information)
+
+        if not (len(self.iDs) == len(self.information) == self.data.shape[0]):
+            raise ProfileError(f"Number of iDs ({len(self.iDs)}), information entries ({len(self.information)}) "
+                               f"and data rows ({self.data.shape[0]}) differ.")
+
+        # iD -> position and information value -> positions indices, built on first use
+        self._iD_index: ProfileIDIndex = None
+        self._information_index: InformationIndex = None
+
+    @classmethod
+    def objectify_w_profiles(cls, profiles: List['Profile'], fractions: List[str] = None, fill_missing: bool = False) -> Self:
+
+        """
+        Builds a ProfileSet out of a list of profiles (or returns the ProfileSet itself if one is passed in).
+        If no fractions are specified the first profile in the list provides the fraction axis.
+        A profile without a value for one of the fractions raises UnequalFractionsError, unless fill_missing is set:
+        missing fractions are then stored as NaN, and without specified fractions the axis is the union of the
+        fractions of all profiles (in order of appearance).
+        """
+
+        if isinstance(profiles, ProfileSet):
+            if fractions is None or list(fractions) == profiles.fractions:
+                return profiles
+            return profiles.select_fractions(fractions, fill_missing)
+
+        if not profiles:
+            raise EmptyProfileListError
+
+        if fractions is None:
+            if fill_missing:
+                fractions = list(dict.fromkeys(fraction for profile in profiles for fraction in profile.sampleData.keys()))
+            else:
+                fractions = list(profiles[0].sampleData.keys())
+
+        data = np.empty((len(profiles), len(fractions)), dtype=np.float64)
+        # fraction index of array-backed sampleData -> its columns in fraction order, resolved once per index
+        columns: Dict[int, np.ndarray] = {}
+
+        try:
+            for index, profile in enumerate(profiles):
+                sample_data = profile.sampleData
+
+                if isinstance(sample_data, SampleDataView):
+                    key = id(sample_data._fraction_index)
+                    if key not in columns:
+                        columns[key] = ProfileSet._columns(sample_data._fraction_index, fractions, fill_missing)
+                    data[index] = sample_data._row[columns[key]]
+                    if fill_missing:
+                        data[index, columns[key] < 0] = np.nan
+                elif fill_missing:
+                    data[index] = [sample_data.get(fraction, np.nan) for fraction in fractions]
+                else:
+                    data[index] = [sample_data[fraction] for fraction in fractions]
+
+        except KeyError as e:
+            raise UnequalFractionsError(f"Profile {profile.iD} has no value for fraction {e}.")
+
+        return cls([profile.iD for profile in profiles], [profile.information for profile in profiles], data, fractions)
+
+    @staticmethod
+    def _columns(fraction_index: Dict[str, int], fractions: List[str], fill_missing: bool) -> np.ndarray:
+
+        # positions of the fractions in a fraction index; -1 marks missing fractions if fill_missing is set
+        if fill_missing:
+            return np.array([fraction_index.get(fraction, -1) for fraction in fractions], dtype=np.intp)
+
+        return np.array([fraction_index[fraction] for fraction in fractions], dtype=np.intp)
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __iter__(self) -> Iterator[FractionProfile]:
+        for position in range(len(self)):
+            yield self.profile(position)
+
+    def __getitem__(self, key):
+
+        # single position -> FractionProfile view, everything else (slice, positions, boolean mask) -> ProfileSet
+        if isinstance(key, (int, np.integer)):
+            return self.profile(key)
+
+        return self.subset(key)
+
+    def __repr__(self) -> str:
+        return f"ProfileSet(no_profiles={len(self)}, no_fractions={len(self.fractions)})"
+
+    @property
+    def shape(self) -> tuple:
+        return self.data.shape
+
+    @property
+    def iD_index(self) -> ProfileIDIndex:
+
+        '''
+        hash index from iD to row, built on first access. Raises DuplicateProfileError if iDs are not unique.
+        '''
+
+        if self._iD_index is None:
+            self._iD_index = ProfileIDIndex(list(self.iDs))
+
+        return self._iD_index
+
+    @property
+    def information_index(self) -> InformationIndex:
+
+        '''
+        inverted index over the information table, built on first access.
+        '''
+
+        if self._information_index is None:
+            self._information_index = InformationIndex(self.information)
+
+        return self._information_index
+
+    def profile(self, position: int) -> FractionProfile:
+
+        '''
+        returns a FractionProfile whose sampleData reads from (and writes to) the corresponding row of the ProfileSet.
+        '''
+
+        if not -len(self) <= position < len(self):
+            raise ProfileNotFoundError(f"Position {position} is out of range for a ProfileSet of {len(self)} profiles.")
+
+        return FractionProfile(self.iDs[position], self.information[position], SampleDataView(self.fraction_index, self.data[position]))
+
+    def to_profiles(self) -> List[FractionProfile]:
+        return [self.profile(position) for position in range(len(self))]
+
+    def subset(self, positions) -> Self:
+
+        '''
+        returns a new ProfileSet with the selected rows. Positions can be a slice, a list/array of positions or a boolean mask.
+        '''
+
+        if isinstance(positions, slice):
+            return ProfileSet(self.iDs[positions], self.information[positions], self.data[positions], self.fractions)
+
+        positions = np.asarray(positions)
+
+        if positions.dtype == bool:
+            positions = np.flatnonzero(positions)
+
+        return ProfileSet(self.iDs[positions], [self.information[position] for position in positions], self.data[positions], self.fractions)
+
+    def select_fractions(self, fractions: List[str], fill_missing: bool = False) -> Self:
+
+        '''
+        returns a new ProfileSet restricted to (and ordered by) the given fractions. Fractions that are not part of
+        the ProfileSet raise UnequalFractionsError, or become NaN columns if fill_missing is set.
+        '''
+
+        try:
+            columns = ProfileSet._columns(self.fraction_index, fractions, fill_missing)
+        except KeyError as e:
+            raise UnequalFractionsError(f"Fraction {e} is not part of the ProfileSet.")
+
+        data = self.data[:, columns]
+        data[:, columns < 0] = np.nan
+
+        return ProfileSet(self.iDs, self.information, data, fractions)
+
+    def information_column(self, key: str) -> np.ndarray:
+
+        '''
+        returns the values of one information key for all profiles as an array (column of the metadata table).
+        '''
+
+        return np.asarray([information[key] for information in self.information], dtype=object)
+
+    @staticmethod
+    def concatenate(profile_sets: List['ProfileSet']) -> 'ProfileSet':
+
+        '''
+        stacks several ProfileSets sharing the same fraction axis into one.
+        '''
+
+        if not profile_sets:
+            raise EmptyProfileListError
+
+        fractions = profile_sets[0].fractions
+
+        for profile_set in profile_sets[1:]:
+            if profile_set.fractions != fractions:
+                raise UnequalFractionsError
+
+        return ProfileSet(np.concatenate([profile_set.iDs for profile_set in profile_sets]),
+                          [information for profile_set in profile_sets for information in profile_set.information],
+                          np.concatenate([profile_set.data for profile_set in profile_sets]),
+                          fractions)
@@ -1,9 +1,10 @@
+import numpy as np
 from .FractionProfile import FractionProfile
+from .ProfileSet import ProfileSet
 from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError
 import math
-from typing import Self, List, Dict, Set
+from typing import Self, List, Dict, Set, Tuple
 from deprecated import deprecated
-import matplotlib.pyplot as plt
 
 class ReferenceProfile(FractionProfile):
 
@@ -40,6 +41,56 @@ class ReferenceProfile(FractionProfile):
             # ToDo deepcopy   
             return [cls(profile.iD, profile.information, profile.sampleData, reference_profile, logarithm) for profile in profiles]
     
+    @staticmethod
+    def normalize_profile_set(profiles: List[FractionProfile], reference_profile: FractionProfile, base: float = math.e,
+                              in_place: bool = False) -> Tuple[ProfileSet, np.ndarray]:
+
+        """
+        Log-ratio of a whole profile collection against a reference profile in one array operation:
+        log_base(intensity / reference). Profiles with a result that is not finite (zero or negative intensities,
+        NaN) are set to NaN and reported in a mask instead of aborting the batch.
+
+        Args:
+            profiles (List[FractionProfile]): profiles (list or ProfileSet) to normalize.
+            reference_profile (FractionProfile): reference with the same fractions.
+            base (float): base of the logarithm, e.g. math.e (default), 2 or 10.
+            in_place (bool): if a ProfileSet is passed, overwrite its data instead of returning a normalized copy.
+
+        Returns:
+            Tuple[ProfileSet, np.ndarray]: normalized profiles and a boolean mask of the invalid ones.
+
+        Raises:
+            UnequalFractionsError: If the reference does not have the fractions of the profiles.
+            FractionZeroDivisionError: If the reference is zero in a fraction, which would invalidate every profile.
+        """
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles)
+
+        if sorted(reference_profile.sampleData.keys()) != sorted(profile_set.fractions):
+            raise UnequalFractionsError
+
+        reference = np.array([reference_profile.sampleData[fraction] for fraction in profile_set.fractions], dtype=np.float64)
+
+        if np.any(reference == 0):
+            raise FractionZeroDivisionError(reference_profile.sampleData)
+
+        data = profile_set.data if in_place else profile_set.data.copy()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(data, reference, out=data)
+            np.log(data, out=data)
+
+        if base != math.e:
+            data /= math.log(base)
+
+        invalid = ~np.all(np.isfinite(data), axis=1)
+        data[invalid] = np.nan
+
+        if in_place:
+            return profile_set, invalid
+
+        return ProfileSet(profile_set.iDs, profile_set.information, data, profile_set.fractions), invalid
+
     # function replaced with objectify_w_profile   
     @deprecated    
     @staticmethod
@@ -0,0 +1,314 @@
+import numpy as np
+from .ProfileSet import ProfileSet
+from .StatProfile import StatProfile
+from .ProfileErrors import ProfileError, UnequalFractionsError, EmptyProfileListError, ProfileNotFoundError
+from typing import Self, List, Dict, Set, Tuple, Hashable
+
+
+class StatAccumulator(object):
+
+    def __init__(self, fractions: List[str], key: str, capacity: int = 16):
+
+        """
+        Running statistics of groups of profiles (e.g. all replicates of a protein group), which can absorb new
+        profiles and be merged with accumulators built on other partitions or processes. Per group it keeps
+
+            - count, mean and the sum of squared deviations (Welford / Chan et al. update), so mean and std are exact,
+            - the exact minimum and maximum per fraction,
+            - a quantile sketch of at most capacity weighted centroids per fraction. As long as a group has no more
+              than capacity profiles the sketch holds the values themselves and the median is exact; beyond that
+              the centroids are compressed and quantiles are interpolated between them, anchored at the exact
+              minimum and maximum. Such medians are approximations (typically within a few percent of the spread
+              of the group), unlike the exact medians of StatProfile.group_stats.
+
+        Adding profiles only touches the groups they belong to, so it costs O(new profiles), regardless of how
+        many profiles were accumulated before.
+
+            accumulator = StatAccumulator.objectify_w_profiles(week_1, key="PG")
+            accumulator.add(week_2)
+            accumulator.merge(accumulator_of_other_process)
+            stat_profiles = accumulator.to_stat_profiles()
+
+        Args:
+            fractions (List[str]): fractions of the accumulated profiles.
+            key (str): information key that defines the groups.
+            capacity (int): number of centroids per group and fraction kept by the quantile sketch.
+        """
+
+        if capacity < 2:
+            raise ProfileError("The capacity of the quantile sketch has to be at least 2.")
+
+        self.fractions: List[str] = list(fractions)
+        self.key: str = key
+        self.capacity: int = capacity
+
+        self.groups: List[Hashable] = []
+        self.group_index: Dict[Hashable, int] = {}
+
+        no_fractions = len(self.fractions)
+        self.counts: np.ndarray = np.zeros(0, dtype=np.int64)
+        self.means: np.ndarray = np.zeros((0, no_fractions))
+        self.squares: np.ndarray = np.zeros((0, no_fractions))  # sum of squared deviations from the mean
+        self.minima: np.ndarray = np.zeros((0, no_fractions))
+        self.maxima: np.ndarray = np.zeros((0, no_fractions))
+
+        # quantile sketch: (groups, capacity, fractions) centroid values and weights, used slots per group
+        self.centroids: np.ndarray = np.zeros((0, capacity, no_fractions))
+        self.weights: np.ndarray = np.zeros((0, capacity, no_fractions))
+        self.used: np.ndarray = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def objectify_w_profiles(cls, profiles: List['Profile'], key: str, fractions: List[str] = None, capacity: int = 16) -> Self:
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles, fractions)
+
+        accumulator = cls(profile_set.fractions, key, capacity)
+        accumulator.add(profile_set)
+
+        return accumulator
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __repr__(self) -> str:
+        return f"StatAccumulator(no_groups={len(self.groups)}, no_profiles={int(self.counts.sum())}, no_fractions={len(self.fractions)})"
+
+    def _codes(self, labels: List[Hashable]) -> np.ndarray:
+
+        '''
+        group codes of the labels; unknown groups are appended and the arrays grown (by doubling) to fit them.
+        '''
+
+        index = self.group_index
+        for label in labels:
+            if label not in index:
+                index[label] = len(self.groups)
+                self.groups.append(label)
+
+        if len(self.groups) > len(self.counts):
+            size = max(len(self.groups), 2 * len(self.counts))
+            grow = size - len(self.counts)
+            self.counts = np.concatenate((self.counts, np.zeros(grow, dtype=np.int64)))
+            self.means = np.concatenate((self.means, np.zeros((grow, len(self.fractions)))))
+            self.squares = np.concatenate((self.squares, np.zeros((grow, len(self.fractions)))))
+            self.minima = np.concatenate((self.minima, np.full((grow, len(self.fractions)), np.inf)))
+            self.maxima = np.concatenate((self.maxima, np.full((grow, len(self.fractions)), -np.inf)))
+            self.centroids = np.concatenate((self.centroids, np.zeros((grow, self.capacity, len(self.fractions)))))
+            self.weights = np.concatenate((self.weights, np.zeros((grow, self.capacity, len(self.fractions)))))
+            self.used = np.concatenate((self.used, np.zeros(grow, dtype=np.int64)))
+
+        return np.fromiter((index[label] for label in labels), dtype=np.int64, count=len(labels))
+
+    def _combine(self, codes: np.ndarray, counts: np.ndarray, means: np.ndarray, squares: np.ndarray) -> None:
+
+        # Chan et al.: merge (count, mean, squared deviations) of two partitions of the same group
+        total = self.counts[codes] + counts
+        delta = means - self.means[codes]
+        factor = (counts / total)[:, None]
+
+        self.squares[codes] += squares + delta ** 2 * (self.counts[codes] * factor.ravel())[:, None]
+        self.means[codes] += delta * factor
+        self.counts[codes] = total
+
+    def _extremes(self, codes: np.ndarray, minima: np.ndarray, maxima: np.ndarray) -> None:
+        self.minima[codes] = np.minimum(self.minima[codes], minima)
+        self.maxima[codes] = np.maximum(self.maxima[codes], maxima)
+
+    def _insert(self, codes: np.ndarray, values: np.ndarray, weights: np.ndarray) -> None:
+
+        '''
+        puts centroids (rows of values with their weights) into the sketches of their groups, compressing the
+        sketches that overflow.
+        '''
+
+        order = np.argsort(codes, kind="stable")
+        codes, values, weights = codes[order], values[order], weights[order]
+
+        # rank of every entry within its group -> free slot it goes to
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], boundaries))
+        ranks = np.arange(len(codes)) - np.repeat(starts, np.diff(np.concatenate((starts, [len(codes)]))))
+        slots = self.used[codes] + ranks
+
+        fits = slots < self.capacity
+        self.centroids[codes[fits], slots[fits]] = values[fits]
+        self.weights[codes[fits], slots[fits]] = weights[fits]
+        np.add.at(self.used, codes[fits], 1)
+
+        for code in np.unique(codes[~fits]):
+            overflow = (codes == code) & ~fits
+            used = self.used[code]
+            self._compress(code, np.concatenate((self.centroids[code, :used], values[overflow])),
+                           np.concatenate((self.weights[code, :used], weights[overflow])))
+
+    def _compress(self, code: int, values: np.ndarray, weights: np.ndarray) -> None:
+
+        # per fraction the neighbouring centroids with the smallest joint weight are merged (weighted mean) until
+        # three quarters of the slots are used; heavy centroids stay untouched, so the resolution is kept where
+        # most of the weight sits and a quarter of the slots is free for the following inserts
+        no_centroids = max(1, self.capacity * 3 // 4)
+        self.centroids[code] = 0
+        self.weights[code] = 0
+
+        for column in range(values.shape[1]):
+            order = np.argsort(values[:, column], kind="stable")
+            value, weight = values[order, column].tolist(), weights[order, column].tolist()
+
+            while len(value) > no_centroids:
+                joint = [left + right for left, right in zip(weight, weight[1:])]
+                position = joint.index(min(joint))
+                value[position] = (value[position] * weight[position] + value[position + 1] * weight[position + 1]) / joint[position]
+                weight[position] = joint[position]
+                del value[position + 1], weight[position + 1]
+
+            self.centroids[code, :no_centroids, column] = value
+            self.weights[code, :no_centroids, column] = weight
+
+        self.used[code] = no_centroids
+
+    def add(self, profiles: List['Profile']) -> None:
+
+        '''
+        absorbs new profiles (list or ProfileSet). Only the groups of the new profiles are updated.
+        '''
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles, self.fractions)
+
+        try:
+            labels = [information[self.key] for information in profile_set.information]
+        except KeyError:
+            raise ProfileError(f"Profile information has no key {self.key}.")
+
+        codes = self._codes(labels)
+
+        # statistics of the new profiles per group, then merged into the running ones
+        order = np.argsort(codes, kind="stable")
+        sorted_codes, data = codes[order], profile_set.data[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_codes)) + 1))
+        touched = sorted_codes[starts]
+
+        counts = np.diff(np.concatenate((starts, [len(sorted_codes)])))
+        means = np.add.reduceat(data, starts, axis=0) / counts[:, None]
+        squares = np.add.reduceat((data - np.repeat(means, counts, axis=0)) ** 2, starts, axis=0)
+
+        self._combine(touched, counts, means, squares)
+        self._extremes(touched, np.minimum.reduceat(data, starts, axis=0), np.maximum.reduceat(data, starts, axis=0))
+        self._insert(codes, profile_set.data, np.ones_like(profile_set.data))
+
+    def merge(self, other: 'StatAccumulator') -> Self:
+
+        '''
+        merges an accumulator built on another partition (e.g. in another process) into this one and returns it.
+        '''
+
+        if other.fractions != self.fractions or other.key != self.key:
+            raise UnequalFractionsError("Only accumulators of the same fractions and key can be merged.")
+
+        no_groups = len(other.groups)
+        codes = self._codes(other.groups)
+
+        filled = other.counts[:no_groups] > 0
+        self._combine(codes[filled], other.counts[:no_groups][filled], other.means[:no_groups][filled], other.squares[:no_groups][filled])
+        self._extremes(codes[filled], other.minima[:no_groups][filled], other.maxima[:no_groups][filled])
+
+        # every used slot of the other sketches is inserted as weighted centroid
+        used = other.used[:no_groups]
+        groups = np.repeat(np.arange(no_groups), used)
+        slots = np.arange(len(groups)) - np.repeat(np.cumsum(used) - used, used)
+        self._insert(codes[groups], other.centroids[groups, slots], other.weights[groups, slots])
+
+        return self
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.means[:len(self.groups)]
+
+    @property
+    def variance(self) -> np.ndarray:
+
+        # population variance, as StatProfile._get_std
+        return self.squares[:len(self.groups)] / self.counts[:len(self.groups), None]
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.variance)
+
+    def quantile(self, q: float) -> np.ndarray:
+
+        '''
+        (no_groups, no_fractions) q-quantiles read from the sketches, linearly interpolated like np.quantile.
+        Exact for groups with at most capacity profiles and for q = 0 and 1 (the tracked minimum and maximum);
+        otherwise an approximation interpolated between the compressed centroids.
+        '''
+
+        no_groups = len(self.groups)
+        centroids, weights = self.centroids[:no_groups], self.weights[:no_groups]
+
+        # unused slots are moved behind all used ones
+        unused = np.arange(self.capacity)[None, :, None] >= self.used[:no_groups, None, None]
+        order = np.argsort(np.where(unused, np.inf, centroids), axis=1, kind="stable")
+        centroids = np.take_along_axis(centroids, order, axis=1)
+        weights = np.take_along_axis(weights, order, axis=1)
+
+        # rank of the centre of every centroid; for unit weights these are 0, 1, 2, ...
+        cumulative = np.cumsum(weights, axis=1)
+        centres = np.where(np.take_along_axis(unused, order, axis=1), np.inf, cumulative - weights / 2 - 0.5)
+        last = cumulative[:, -1:, :] - 1
+        target = q * last
+
+        # the exact minimum and maximum are anchored at the first and last rank, so that the ends are exact even when
+        # the outer centroids are means of several values; stable sorting keeps the minimum in front of a centroid
+        # at rank 0 and the maximum behind a centroid at the last rank
+        centres = np.concatenate((np.zeros_like(last), centres, last), axis=1)
+        centroids = np.concatenate((self.minima[:no_groups, None, :], centroids, self.maxima[:no_groups, None, :]), axis=1)
+        order = np.argsort(centres, axis=1, kind="stable")
+        centres = np.take_along_axis(centres, order, axis=1)
+        centroids = np.take_along_axis(centroids, order, axis=1)
+
+        lower = np.clip((centres <= target).sum(axis=1, keepdims=True) - 1, 0, self.capacity + 1)
+        upper = np.minimum(lower + 1, self.used[:no_groups, None, None] + 1)
+
+        lower_centre, upper_centre = np.take_along_axis(centres, lower, axis=1), np.take_along_axis(centres, upper, axis=1)
+        lower_value, upper_value = np.take_along_axis(centroids, lower, axis=1), np.take_along_axis(centroids, upper, axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            fraction = np.where(upper_centre > lower_centre, (target - lower_centre) / (upper_centre - lower_centre), 0)
+
+        return (lower_value + np.clip(fraction, 0, 1) * (upper_value - lower_value))[:, 0, :]
+
+    @property
+    def median(self) -> np.ndarray:
+
+        '''
+        medians from the quantile sketches, see quantile: approximate for groups with more than capacity profiles.
+        '''
+
+        return self.quantile(0.5)
+
+    def group_stats(self) -> Dict[str, object]:
+
+        '''
+        columnar result in the layout of StatProfile.group_stats (without "members"). Counts, means and stds are
+        exact, the medians are approximate for groups with more than capacity profiles (see quantile).
+        '''
+
+        group_information = [{self.key: group} for group in self.groups]
+
+        return {"groups": list(self.groups),
+                "counts": self.counts[:len(self.groups)].copy(),
+                "mean": ProfileSet(self.groups, group_information, self.mean, self.fractions),
+                "median": ProfileSet(self.groups, group_information, self.median, self.fractions),
+                "std": ProfileSet(self.groups, group_information, self.std, self.fractions)}
+
+    def to_stat_profiles(self, main: str = "median") -> List[StatProfile]:
+
+        '''
+        one StatProfile per group. The accumulated profiles themselves are not kept, so StatProfile.profiles is empty.
+        The medians come from the quantile sketches and are approximate for groups with more than capacity profiles.
+        '''
+
+        def as_dict(values: np.ndarray) -> Dict[str, float]:
+            return dict(zip(self.fractions, values.tolist()))
+
+        return [StatProfile.objectify_w_stats(as_dict(mean), as_dict(median), as_dict(std), None, main, group, {self.key: group}, int(count))
+                for group, count, mean, median, std in zip(self.groups, self.counts, self.mean, self.median, self.std)]
@@ -1,8 +1,9 @@
+import numpy as np
 from .FractionProfile import FractionProfile
 from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError
 from typing import Self, List, Dict, Set
 from deprecated import deprecated
-import matplotlib.pyplot as plt
+from .OptionalDependency import OptionalDependency
 
 
 class StatProfile(FractionProfile):
@@ -70,6 +71,118 @@ class StatProfile(FractionProfile):
                 
             return cls(profiles, main, information, iD, fractions)
     
+    @classmethod
+    def objectify_w_stats(cls, mean: Dict[str, float], median: Dict[str, float], std: Dict[str, float], profiles: List[FractionProfile] = None,
+                          main: str = "median", iD: str = None, information: Dict[str, str] = None, number_profiles: int = None) -> Self:
+
+        '''
+        creates a StatProfile out of precomputed statistics (e.g. from StatProfile.group_stats) without looping over
+        the profiles again. profiles are only stored for reference and may be omitted, in which case number_profiles
+        tells how many profiles the statistics were computed from.
+        '''
+
+        stat_profile = cls.__new__(cls)
+
+        stat_profile.profiles = profiles if profiles is not None else []
+        stat_profile.numberProfiles = len(stat_profile.profiles) if number_profiles is None else number_profiles
+        stat_profile.profileSampleData = [list(profile.sampleData.values()) for profile in stat_profile.profiles]
+        stat_profile.fractions = list(mean.keys())
+
+        stat_profile.mean = mean
+        stat_profile.median = median
+        stat_profile.std = std
+        stat_profile.variance = {fraction: value ** 2 for fraction, value in std.items()}
+
+        stat_profile.change_main(main)
+        stat_profile.iD = iD
+        stat_profile.information = information
+
+        return stat_profile
+
+    @staticmethod
+    def group_stats(profiles: List['Profile'], key: str, fractions: List[str] = None) -> Dict[str, object]:
+
+        """
+        Computes mean, median and (population) standard deviation of every group of profiles sharing the same
+        information[key] (e.g. the protein group across replicates) in one vectorized pass: the profiles are sorted
+        by group once, sums are reduced per group segment and medians are read at the middle of every segment after
+        sorting each fraction within the groups.
+
+        Args:
+            profiles (List[Profile]): profiles (list or ProfileSet) to group.
+            key (str): information key that defines the groups.
+            fractions (List[str]): fractions to use. If None the first profile provides the fractions.
+
+        Returns:
+            Dict: columnar result with "groups" (group values in order of appearance), "counts" (profiles per group),
+            "mean", "median" and "std" (each a ProfileSet with one row per group, iD = group value) and "members"
+            (positions of the profiles of every group).
+
+        Raises:
+            ProfileError: If a profile has no value for key.
+        """
+
+        # imported here, ProfileSet itself depends on FractionProfile
+        from .ProfileSet import ProfileSet
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles, fractions)
+
+        try:
+            labels = [information[key] for information in profile_set.information]
+        except KeyError:
+            raise ProfileError(f"Profile information has no key {key}.")
+
+        groups: Dict[str, int] = {}
+        codes = np.fromiter((groups.setdefault(label, len(groups)) for label in labels), dtype=np.int64, count=len(labels))
+
+        # one stable sort brings the members of every group next to each other, in their original order
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        data = profile_set.data[order]
+
+        counts = np.bincount(codes, minlength=len(groups))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        mean = np.add.reduceat(data, starts, axis=0) / counts[:, None]
+        variance = np.add.reduceat((data - mean[sorted_codes]) ** 2, starts, axis=0) / counts[:, None]
+
+        # sort every fraction within the groups: group code as primary, intensity as secondary key
+        within = np.empty_like(data)
+        for column in range(data.shape[1]):
+            within[:, column] = data[np.lexsort((data[:, column], sorted_codes)), column]
+
+        lower, upper = starts + (counts - 1) // 2, starts + counts // 2
+        median = (within[lower] + within[upper]) / 2.0
+
+        group_labels = list(groups)
+        group_information = [{key: group} for group in group_labels]
+
+        return {"groups": group_labels,
+                "counts": counts,
+                "mean": ProfileSet(group_labels, group_information, mean, profile_set.fractions),
+                "median": ProfileSet(group_labels, group_information, median, profile_set.fractions),
+                "std": ProfileSet(group_labels, group_information, np.sqrt(variance), profile_set.fractions),
+                "members": np.split(order, starts[1:])}
+
+    @classmethod
+    def group_by(cls, profiles: List['Profile'], key: str, main: str = "median", fractions: List[str] = None) -> List[Self]:
+
+        '''
+        creates one StatProfile per group of profiles sharing information[key], e.g. one per protein group across
+        replicates. The statistics are computed with group_stats, the loops of __init__ are not used.
+        '''
+
+        stats = StatProfile.group_stats(profiles, key, fractions)
+        fractions = stats["mean"].fractions
+
+        def as_dict(values: np.ndarray) -> Dict[str, float]:
+            return dict(zip(fractions, values.tolist()))
+
+        return [cls.objectify_w_stats(as_dict(mean), as_dict(median), as_dict(std), [profiles[int(position)] for position in members],
+                                      main, group, {key: group})
+                for group, mean, median, std, members in zip(stats["groups"], stats["mean"].data, stats["median"].data,
+                                                             stats["std"].data, stats["members"])]
+
     # change the representation of the sample data to another metrix
     def change_main(self, main):
         
@@ -155,6 +268,8 @@ class StatProfile(FractionProfile):
     
     @deprecated
     def plotter(self, errorbars=True):
+        plt = OptionalDependency.load("matplotlib.pyplot")
+
         # Create the plot
         plt.figure(figsize=(10, 6))  # Set the figure size
 
@@ -1,8 +1,9 @@
+import numpy as np
 from .FractionProfile import FractionProfile
+from .ProfileSet import ProfileSet
 from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError
-from typing import Self, List, Dict, Set
+from typing import Self, List, Dict, Set, Tuple
 from deprecated import deprecated
-import matplotlib.pyplot as plt
 
 class SumProfile(FractionProfile):
 
@@ -22,6 +23,37 @@ class SumProfile(FractionProfile):
         }
 
 
+    @staticmethod
+    def normalize_profile_set(profiles: List[FractionProfile], in_place: bool = False) -> Tuple[ProfileSet, np.ndarray]:
+
+        """
+        Sum normalization of a whole profile collection in one array operation. Instead of raising ZeroSumError,
+        profiles that cannot be normalized (sum of zero, or NaN/inf intensities) are set to NaN and reported in a mask,
+        so that a single bad profile does not abort the batch.
+
+        Args:
+            profiles (List[FractionProfile]): profiles (list or ProfileSet) to normalize.
+            in_place (bool): if a ProfileSet is passed, overwrite its data instead of returning a normalized copy.
+
+        Returns:
+            Tuple[ProfileSet, np.ndarray]: normalized profiles and a boolean mask of the invalid ones.
+        """
+
+        profile_set = ProfileSet.objectify_w_profiles(profiles)
+        data = profile_set.data if in_place else profile_set.data.copy()
+
+        summation = data.sum(axis=1, keepdims=True)
+        invalid = (summation[:, 0] == 0) | ~np.isfinite(summation[:, 0])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(data, summation, out=data)
+        data[invalid] = np.nan
+
+        if in_place:
+            return profile_set, invalid
+
+        return ProfileSet(profile_set.iDs, profile_set.information, data, profile_set.fractions), invalid
+
     # function replaced with objectify_w_profile   
     @deprecated
     @staticmethod
@@ -1,10 +1,28 @@
 from .FractionProfile import FractionProfile
-from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError, ComponentErrorPCA
+from .ProfileErrors import ProfileError, ProfileNegativeDistanceError, ProfileInvalidDistanceError, FractionZeroDivisionError, UnequalFractionsError, ZeroSumError, EmptyProfileListError, ProfileNotFoundError, EmptyProfileError, ComponentErrorPCA, DuplicateProfileError
 from .SumProfile import SumProfile
 from .ReferenceProfile import ReferenceProfile
 from .StatProfile import StatProfile
 from .ProfilePCA import ProfilePCA
+from .ProfileSet import ProfileSet, SampleDataView
+from .CondensedDistanceMatrix import CondensedDistanceMatrix
+from .DistanceEngine import DistanceEngine
+from .NeighbourIndex import NeighbourIndex
+from .ProfileIDIndex import ProfileIDIndex
+from .InformationIndex import InformationIndex
+from .ProfileQuery import Query, Eq, In, Not, And, Or
+from .CubeStore import CubeStore
+from .ImmunoCube import ImmunoCube
+from .StatAccumulator import StatAccumulator
+from .ProfilePipeline import ProfilePipeline
+from .DistanceCache import DistanceCache
+from .IncrementalDistanceMatrix import IncrementalDistanceMatrix
+from .MovementEngine import MovementEngine
+from .MovementTest import MovementTest
+from .PCAModel import PCAModel
+from .FractionSchema import FractionSchema
+from .CompactProfile import CompactProfile, SharedInformation
 from .ProfileFactory import ProfileFactory
 from .ProfileManager import ProfileManager
 
-__all__ = ['FractionProfile', 'ProfileError', 'ProfileNegativeDistanceError', 'ProfileInvalidDistanceError', 'FractionZeroDivisionError', 'UnequalFractionsError', 'ZeroSumError', 'EmptyProfileListError', 'SumProfile', 'ReferenceProfile', 'StatProfile', 'ProfilePCA', 'ProfileNotFoundError', 'EmptyProfileError', 'ComponentErrorPCA', 'ProfileFactory', 'ProfileManager']
\ No newline at end of file
+__all__ = ['FractionProfile', 'ProfileError', 'ProfileNegativeDistanceError', 'ProfileInvalidDistanceError', 'FractionZeroDivisionError', 'UnequalFractionsError', 'ZeroSumError', 'EmptyProfileListError', 'SumProfile', 'ReferenceProfile', 'StatProfile', 'ProfilePCA', 'ProfileNotFoundError', 'EmptyProfileError', 'ComponentErrorPCA', 'ProfileFactory', 'ProfileManager', 'ProfileSet', 'SampleDataView', 'DistanceEngine', 'CondensedDistanceMatrix', 'NeighbourIndex', 'DuplicateProfileError', 'ProfileIDIndex', 'InformationIndex', 'Query', 'Eq', 'In', 'Not', 'And', 'Or', 'CubeStore', 'ImmunoCube', 'StatAccumulator', 'ProfilePipeline', 'DistanceCache', 'IncrementalDistanceMatrix', 'MovementEngine', 'MovementTest', 'PCAModel', 'FractionSchema', 'CompactProfile', 'SharedInformation']
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+Import time benchmark of ClassProfiles. Every measurement runs in a fresh interpreter, like a worker process does.
+Fails (exit code 1) if importing the package loads one of the optional heavy dependencies or if the median import
+time exceeds the budget.
+
+    python benchmarks/bench_import.py --repeats 10 --budget 1.0
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# must not be imported by "import ClassProfiles", only when plotting or fitting
+DEFERRED = ["matplotlib", "seaborn", "sklearn", "scipy"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import ClassProfiles
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": sorted({name.split(".")[0] for name in sys.modules})}))
+"""
+
+
+def measure() -> dict:
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True, env=environment).stdout
+
+    return json.loads(output)
+
+
+def main() -> int:
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=10, help="number of fresh interpreters to time")
+    parser.add_argument("--budget", type=float, default=1.0, help="maximum median import time in seconds")
+    arguments = parser.parse_args()
+
+    runs = [measure() for _ in range(arguments.repeats)]
+    seconds = [run["seconds"] for run in runs]
+    median = statistics.median(seconds)
+    loaded = [module for module in DEFERRED if module in runs[0]["loaded"]]
+
+    print(f"import ClassProfiles: median {median * 1000:.1f} ms, min {min(seconds) * 1000:.1f} ms, max {max(seconds) * 1000:.1f} ms "
+          f"over {arguments.repeats} runs")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: deferred dependencies imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if median > arguments.budget:
+        print(f"FAIL: median import time exceeds the budget of {arguments.budget * 1000:.0f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
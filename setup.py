@@ -9,7 +9,13 @@ setup(
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown', # ToDo
     ############
-    install_requires=["math","warnings","sklearn","matplotlib.pyplot", "deprecated"],
+    install_requires=["numpy", "deprecated"],
+    # plotting and scikit-learn are imported on first use, see ClassProfiles/OptionalDependency.py
+    extras_require={
+        "plot": ["matplotlib", "seaborn"],
+        "sklearn": ["scikit-learn"],
+        "all": ["matplotlib", "seaborn", "scikit-learn"],
+    },
     packages=find_packages(),
     ############
     url='http://example.com', # ToDo